@@ -50,6 +50,7 @@ class VendorProfile(models.Model):
     description = models.TextField(blank=True, null=True)
     website = models.URLField(blank=True, null=True)
     logo = models.ImageField(upload_to='vendor_logos/', blank=True, null=True)
+    logo_variants = models.JSONField(default=dict, blank=True, editable=False)
     rating = models.DecimalField(max_digits=3, decimal_places=2, default=0.0)
     total_reviews = models.PositiveIntegerField(default=0)
     is_verified = models.BooleanField(default=False)
@@ -3,6 +3,7 @@ from django.contrib.auth import authenticate
 from django.contrib.auth.password_validation import validate_password
 from rest_framework_simplejwt.tokens import RefreshToken
 from .models import User, VendorProfile, Membership
+from eventmanagement.images import ImageVariantsField
 
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
@@ -36,6 +37,7 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
 
 class VendorProfileSerializer(serializers.ModelSerializer):
     user = serializers.StringRelatedField(read_only=True)
+    logo_variants = ImageVariantsField()
 
     class Meta:
         model = VendorProfile
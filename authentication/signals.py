@@ -0,0 +1,11 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from eventmanagement.images import schedule_variants
+from .models import VendorProfile
+
+
+@receiver(post_save, sender=VendorProfile)
+def generate_logo_variants(sender, instance, raw=False, **kwargs):
+    if not raw:
+        schedule_variants(instance, 'logo', 'logo_variants')
@@ -19,6 +19,10 @@ from .serializers import (
     get_tokens_for_user
 )
 from .permissions import IsAdminUser, IsVendorUser, IsOwnerOrAdmin
+from eventmanagement.pagination import KeysetPagination
+
+# Vendor categories are fixed choices, so the payload is built once per process
+VENDOR_CATEGORIES = [{'value': choice[0], 'label': choice[1]} for choice in VendorProfile.CATEGORY_CHOICES]
 
 
 class RegisterView(APIView):
@@ -103,13 +107,14 @@ class UserListCreateView(generics.ListCreateAPIView):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [IsAdminUser]
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         queryset = User.objects.all()
         role = self.request.query_params.get('role', None)
         if role:
             queryset = queryset.filter(role=role)
-        return queryset
+        return queryset.order_by('-created_at')
 
 
 class UserDetailView(generics.RetrieveUpdateDestroyAPIView):
@@ -200,5 +205,4 @@ def user_memberships(request):
 @permission_classes([permissions.AllowAny])
 def categories_list(request):
     """Get list of vendor categories"""
-    categories = [{'value': choice[0], 'label': choice[1]} for choice in VendorProfile.CATEGORY_CHOICES]
-    return Response(categories)
+    return Response(VENDOR_CATEGORIES)
@@ -0,0 +1,85 @@
+"""
+Versioned response cache for read-mostly public endpoints.
+
+Each namespace has a version stamp that writers bump through ``invalidate``.
+Cached entries remember the version they were built from; an entry that is
+outdated or past its freshness window is still served while a single
+background thread rebuilds it, so steady-state reads never wait on the
+database.
+"""
+import hashlib
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'response-cache'
+
+
+def _version_key(namespace):
+    return f'{KEY_PREFIX}:{namespace}:version'
+
+
+def get_version(namespace):
+    version = cache.get(_version_key(namespace))
+    if version is None:
+        version = time.time_ns()
+        if not cache.add(_version_key(namespace), version, timeout=None):
+            version = cache.get(_version_key(namespace), version)
+    return version
+
+
+def invalidate(namespace):
+    """Mark every cached entry of ``namespace`` as outdated."""
+    cache.set(_version_key(namespace), time.time_ns(), timeout=None)
+
+
+def _store(entry_key, version, data):
+    cache.set(
+        entry_key,
+        {'version': version, 'fresh_until': time.time() + settings.RESPONSE_CACHE_TIMEOUT, 'data': data},
+        timeout=settings.RESPONSE_CACHE_STALE_TIMEOUT,
+    )
+
+
+def _refresh_in_background(namespace, entry_key, builder):
+    lock_key = f'{entry_key}:refreshing'
+    if not cache.add(lock_key, True, timeout=settings.RESPONSE_CACHE_REFRESH_TIMEOUT):
+        # Another worker is already rebuilding this entry
+        return
+
+    def refresh():
+        try:
+            version = get_version(namespace)
+            _store(entry_key, version, builder())
+        except Exception:
+            logger.exception('Refreshing cached response %s failed', entry_key)
+        finally:
+            cache.delete(lock_key)
+            connections.close_all()
+
+    threading.Thread(target=refresh, daemon=True).start()
+
+
+def cached_response_data(namespace, key, builder):
+    """
+    Return the cached result of ``builder()`` for ``key`` within ``namespace``.
+    Only a cold miss calls ``builder`` on the request path.
+    """
+    entry_key = f'{KEY_PREFIX}:{namespace}:{hashlib.md5(key.encode()).hexdigest()}'
+    version = get_version(namespace)
+    entry = cache.get(entry_key)
+
+    if entry is None:
+        data = builder()
+        _store(entry_key, version, data)
+        return data
+
+    if entry['version'] != version or entry['fresh_until'] < time.time():
+        _refresh_in_background(namespace, entry_key, builder)
+    return entry['data']
@@ -0,0 +1,33 @@
+import hashlib
+
+from django.views.decorators.http import condition
+
+
+def versioned_condition(version_func):
+    """
+    Conditional GET support driven by one cheap version lookup.
+
+    ``version_func(request, *args, **kwargs)`` returns ``(version, last_modified)``
+    for the requested resource, or None when it does not exist. The strong ETag
+    hashes the version together with the requesting user and full path, and
+    ``last_modified`` becomes the Last-Modified header. Matching If-None-Match or
+    If-Modified-Since headers get a 304 before the view serializes anything.
+    """
+    def get_state(request, *args, **kwargs):
+        if not hasattr(request, '_resource_version'):
+            request._resource_version = version_func(request, *args, **kwargs)
+        return request._resource_version
+
+    def etag(request, *args, **kwargs):
+        state = get_state(request, *args, **kwargs)
+        if state is None:
+            return None
+        version, last_modified = state
+        key = f'{request.user.pk}|{request.get_full_path()}|{version}|{last_modified and last_modified.isoformat()}'
+        return hashlib.sha1(key.encode()).hexdigest()
+
+    def last_modified(request, *args, **kwargs):
+        state = get_state(request, *args, **kwargs)
+        return state[1] if state else None
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
@@ -0,0 +1,175 @@
+"""
+Resized variants for uploaded images.
+
+When a model's image field changes, the original is handed to a process pool
+that decodes it once and re-encodes thumbnail, card and full size JPEGs with
+Pillow. The variants are written next to the original under ``variants/`` and
+their storage names are recorded in a JSON field on the row, which serializers
+expose as absolute URLs.
+"""
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+from rest_framework import serializers
+
+logger = logging.getLogger(__name__)
+
+IMAGE_VARIANTS = {
+    'thumbnail': (150, 150),
+    'card': (400, 400),
+    'full': (1200, 1200),
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+# (model label, pk, source) of renders currently queued, so repeated saves do not re-queue them
+_pending = set()
+_pending_lock = threading.Lock()
+
+
+def render_variants(data):
+    """Decode image bytes and return ``{variant: jpeg bytes}``. Runs in a worker process."""
+    with Image.open(BytesIO(data)) as source:
+        image = ImageOps.exif_transpose(source)
+        if image.mode in ('RGBA', 'LA', 'P'):
+            image = image.convert('RGBA')
+            background = Image.new('RGB', image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel('A'))
+            image = background
+        elif image.mode != 'RGB':
+            image = image.convert('RGB')
+
+        rendered = {}
+        for name, size in IMAGE_VARIANTS.items():
+            variant = image.copy()
+            variant.thumbnail(size, Image.LANCZOS)
+            buffer = BytesIO()
+            variant.save(buffer, 'JPEG', quality=82, optimize=True, progressive=True)
+            rendered[name] = buffer.getvalue()
+        return rendered
+
+
+def variant_name(source_name, variant):
+    directory, filename = os.path.split(source_name)
+    stem = os.path.splitext(filename)[0]
+    return os.path.join(directory, 'variants', f'{stem}_{variant}.jpg')
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.IMAGE_VARIANT_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+        return _executor
+
+
+def _store_variants(model, pk, field_name, variants_field, source, storage, rendered, on_stored=None):
+    variants = {'source': source}
+    for name, content in rendered.items():
+        path = variant_name(source, name)
+        if storage.exists(path):
+            storage.delete(path)
+        variants[name] = storage.save(path, ContentFile(content))
+
+    # Only record the variants if the row still points at the same original
+    values = {variants_field: variants}
+    if any(field.name == 'updated_at' for field in model._meta.concrete_fields):
+        values['updated_at'] = timezone.now()
+    if model.objects.filter(pk=pk, **{field_name: source}).update(**values) and on_stored:
+        on_stored()
+
+
+def _on_rendered(model, pk, field_name, variants_field, source, storage, on_stored, future):
+    try:
+        _store_variants(model, pk, field_name, variants_field, source, storage, future.result(), on_stored)
+    except Exception:
+        logger.exception('Generating variants for %s failed', source)
+    finally:
+        with _pending_lock:
+            _pending.discard((model._meta.label, pk, source))
+        # Callbacks run on the pool's management thread, which keeps its own connection
+        connections.close_all()
+
+
+def schedule_variants(instance, field_name, variants_field, on_stored=None):
+    """
+    Queue variant generation for ``instance.<field_name>`` if the image changed
+    since the variants recorded in ``instance.<variants_field>`` were built.
+    ``on_stored`` is called once the variants have been recorded.
+    """
+    image = getattr(instance, field_name)
+    recorded = getattr(instance, variants_field) or {}
+    model = type(instance)
+
+    if not image:
+        if recorded:
+            model.objects.filter(pk=instance.pk).update(**{variants_field: {}})
+        return
+    if recorded.get('source') == image.name:
+        return
+
+    source, storage, pk = image.name, image.storage, instance.pk
+
+    def submit():
+        if not settings.IMAGE_VARIANTS_ASYNC:
+            with storage.open(source, 'rb') as original:
+                data = original.read()
+            _store_variants(model, pk, field_name, variants_field, source, storage, render_variants(data), on_stored)
+            return
+
+        key = (model._meta.label, pk, source)
+        with _pending_lock:
+            if key in _pending:
+                return
+            _pending.add(key)
+        try:
+            with storage.open(source, 'rb') as original:
+                data = original.read()
+            future = get_executor().submit(render_variants, data)
+        except Exception:
+            with _pending_lock:
+                _pending.discard(key)
+            logger.exception('Queueing variants for %s failed', source)
+            return
+        future.add_done_callback(
+            partial(_on_rendered, model, pk, field_name, variants_field, source, storage, on_stored)
+        )
+
+    transaction.on_commit(submit)
+
+
+def variant_urls(variants, request=None):
+    urls = {}
+    if not variants:
+        return urls
+    for name in IMAGE_VARIANTS:
+        if name in variants:
+            url = default_storage.url(variants[name])
+            urls[name] = request.build_absolute_uri(url) if request else url
+    return urls
+
+
+class ImageVariantsField(serializers.Field):
+    """Read-only field rendering a stored variants mapping as URLs."""
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        return variant_urls(value, self.context.get('request'))
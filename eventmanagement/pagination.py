@@ -0,0 +1,141 @@
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(PageNumberPagination):
+    """
+    Page number pagination that switches to keyset (seek) pagination when the
+    request carries a ``cursor`` parameter (``?cursor=`` for the first page).
+
+    Keyset pages are located with a ``WHERE (field, id) > (value, last_id)``
+    predicate on the queryset's leading ordering field, so they skip the
+    COUNT(*) and OFFSET scan and every page costs the same as the first one.
+    """
+    cursor_query_param = 'cursor'
+    keyset_fields = ('created_at', 'price', 'name')
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.use_keyset = self.cursor_query_param in request.query_params
+        if not self.use_keyset:
+            return super().paginate_queryset(queryset, request, view)
+
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        self.request = request
+        self.field, self.descending = self.get_keyset_ordering(queryset)
+        cursor = self.decode_cursor(request, queryset.model)
+        reverse = cursor is not None and cursor['r']
+
+        queryset = queryset.order_by(*self.get_order_by(self.descending != reverse))
+        if cursor is not None:
+            queryset = queryset.filter(self.get_seek_filter(cursor, self.descending != reverse))
+
+        results = list(queryset[:page_size + 1])
+        has_more = len(results) > page_size
+        results = results[:page_size]
+        if reverse:
+            results.reverse()
+
+        self.has_next = has_more if not reverse else cursor is not None
+        self.has_previous = has_more if reverse else cursor is not None
+        self.first_item = results[0] if results else None
+        self.last_item = results[-1] if results else None
+        return results
+
+    def get_paginated_response(self, data):
+        if not self.use_keyset:
+            return super().get_paginated_response(data)
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_next_link(self):
+        if not self.use_keyset:
+            return super().get_next_link()
+        if not self.has_next or self.last_item is None:
+            return None
+        return self.build_link(self.last_item, reverse=False)
+
+    def get_previous_link(self):
+        if not self.use_keyset:
+            return super().get_previous_link()
+        if not self.has_previous or self.first_item is None:
+            return None
+        return self.build_link(self.first_item, reverse=True)
+
+    def get_keyset_ordering(self, queryset):
+        """Return the leading ordering field usable for seeking, falling back to the primary key."""
+        query = queryset.query
+        ordering = query.order_by or (query.get_meta().ordering if query.default_ordering else [])
+        for term in ordering:
+            if not isinstance(term, str):
+                continue
+            name = term.lstrip('-')
+            if name in self.keyset_fields:
+                return name, term.startswith('-')
+            break
+        return 'pk', True
+
+    def get_order_by(self, descending):
+        prefix = '-' if descending else ''
+        if self.field == 'pk':
+            return [f'{prefix}pk']
+        return [f'{prefix}{self.field}', f'{prefix}pk']
+
+    def get_seek_filter(self, cursor, descending):
+        lookup = 'lt' if descending else 'gt'
+        if self.field == 'pk':
+            return Q(**{f'pk__{lookup}': cursor['id']})
+        return (
+            Q(**{f'{self.field}__{lookup}': cursor['v']}) |
+            Q(**{self.field: cursor['v'], f'pk__{lookup}': cursor['id']})
+        )
+
+    def build_link(self, item, reverse):
+        value = None
+        if self.field != 'pk':
+            value = getattr(item, self.field)
+            if isinstance(value, (datetime, date)):
+                value = value.isoformat()
+            elif isinstance(value, Decimal):
+                value = str(value)
+        cursor = {'f': self.field, 'v': value, 'id': item.pk, 'r': reverse}
+        encoded = base64.urlsafe_b64encode(json.dumps(cursor, separators=(',', ':')).encode()).decode()
+
+        url = remove_query_param(self.request.build_absolute_uri(), self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param, encoded)
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+            valid = (
+                isinstance(cursor, dict) and
+                cursor.get('f') == self.field and
+                isinstance(cursor.get('id'), int) and
+                isinstance(cursor.get('r'), bool)
+            )
+            if valid and self.field != 'pk':
+                valid = model._meta.get_field(self.field).to_python(cursor.get('v')) is not None
+        except (TypeError, ValueError, ValidationError, binascii.Error, UnicodeDecodeError):
+            valid = False
+        if not valid:
+            raise NotFound(self.invalid_cursor_message)
+        return cursor
@@ -0,0 +1,51 @@
+from rest_framework import serializers
+
+
+def _split_param(request, name):
+    value = request.query_params.get(name) if request is not None else None
+    if value is None:
+        return None
+    return {part.strip() for part in value.split(',') if part.strip()}
+
+
+class DynamicFieldsMixin:
+    """
+    Request-level field selection for top-level serializers.
+
+    Without ``?fields=`` the full representation is returned. With
+    ``?fields=a,b`` only those fields are kept, and the nested relations listed
+    in ``expandable_fields`` are left out unless they are named in ``fields`` or
+    in ``?expand=``. Views use ``expanded_fields`` to prefetch only the
+    relations that will be serialized. Selection only shapes the output:
+    writable fields that are not selected still accept input.
+    """
+    expandable_fields = ()
+
+    @classmethod
+    def expanded_fields(cls, request):
+        fields = _split_param(request, 'fields')
+        if fields is None:
+            return set(cls.expandable_fields)
+        expand = _split_param(request, 'expand') or set()
+        return {name for name in cls.expandable_fields if name in fields or name in expand}
+
+    def _is_root(self):
+        parent = self.parent
+        return parent is None or (isinstance(parent, serializers.ListSerializer) and parent.parent is None)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get('request')
+        selected = _split_param(request, 'fields')
+        if selected is None or not self._is_root():
+            return fields
+
+        keep = selected | self.expanded_fields(request)
+        for name, field in list(fields.items()):
+            if name in keep:
+                continue
+            if field.read_only:
+                del fields[name]
+            else:
+                field.write_only = True
+        return fields
@@ -1,5 +1,7 @@
 from django.contrib import admin
-from .models import Order, OrderItem, OrderStatusHistory, TransactionLog, VendorOrderNotification
+from .models import (
+    Order, OrderItem, OrderStatusHistory, TransactionLog, VendorOrderNotification, CoPurchaseRun, IdempotencyKey
+)
 
 
 class OrderItemInline(admin.TabularInline):
@@ -26,13 +28,13 @@ class OrderAdmin(admin.ModelAdmin):
                    'payment_method', 'created_at')
     list_filter = ('status', 'payment_status', 'payment_method', 'created_at')
     search_fields = ('order_number', 'user__username', 'user__email', 'contact_email')
-    readonly_fields = ('order_number', 'total_items', 'created_at', 'updated_at',
+    readonly_fields = ('order_number', 'item_count', 'total_items', 'created_at', 'updated_at',
                       'confirmed_at', 'shipped_at', 'delivered_at')
     inlines = [OrderItemInline, OrderStatusHistoryInline, TransactionLogInline]
 
     fieldsets = (
         ('Order Information', {
-            'fields': ('order_number', 'user', 'status', 'total_amount', 'total_items')
+            'fields': ('order_number', 'user', 'status', 'total_amount', 'item_count', 'total_items')
         }),
         ('Payment Information', {
             'fields': ('payment_method', 'payment_status')
@@ -89,3 +91,17 @@ class VendorOrderNotificationAdmin(admin.ModelAdmin):
     list_filter = ('is_read', 'created_at')
     search_fields = ('vendor__username', 'order__order_number', 'message')
     readonly_fields = ('created_at',)
+
+
+@admin.register(CoPurchaseRun)
+class CoPurchaseRunAdmin(admin.ModelAdmin):
+    list_display = ('last_order_id', 'orders_processed', 'pairs_updated', 'created_at')
+    readonly_fields = ('created_at',)
+
+
+@admin.register(IdempotencyKey)
+class IdempotencyKeyAdmin(admin.ModelAdmin):
+    list_display = ('user', 'key', 'status', 'response_status', 'created_at', 'expires_at')
+    list_filter = ('status', 'created_at')
+    search_fields = ('user__username', 'key')
+    readonly_fields = ('created_at',)
@@ -0,0 +1,43 @@
+"""
+Set-based order cancellation shared by ``cancel_order`` and the admin bulk cancel.
+"""
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from products.inventory import invalidate_stock_caches, restock
+from .models import Order, OrderItem, OrderStatusHistory
+
+# Orders in these states can no longer be cancelled
+NON_CANCELLABLE_STATUSES = ('delivered', 'cancelled', 'refunded')
+CANCEL_BATCH_SIZE = 500
+
+
+def cancel_orders(order_ids, user, notes):
+    """
+    Cancel the orders among ``order_ids`` that can still be cancelled, in one
+    transaction: one UPDATE for the order statuses, one grouped query, UPDATE
+    and insert returning their stock and logging it, and one bulk insert of
+    status history. Orders already past cancellation are skipped, also when
+    a concurrent request got there first. Returns the cancelled order ids.
+    """
+    with transaction.atomic():
+        cancellable = Order.objects.filter(pk__in=order_ids).exclude(status__in=NON_CANCELLABLE_STATUSES)
+        # The row locks make a concurrent cancel of the same orders wait and then skip them
+        cancelled = list(cancellable.select_for_update().order_by().values_list('pk', flat=True))
+        if not cancelled:
+            return []
+        Order.objects.filter(pk__in=cancelled).update(status='cancelled', updated_at=timezone.now())
+
+        lines = list(
+            OrderItem.objects.filter(order_id__in=cancelled).order_by()
+            .values('order_id', 'product_id', 'vendor_id').annotate(quantity=Sum('quantity'))
+        )
+        restock(lines, 'cancel', user=user)
+        OrderStatusHistory.objects.bulk_create([
+            OrderStatusHistory(order_id=order_id, status='cancelled', notes=notes, changed_by=user)
+            for order_id in cancelled
+        ])
+
+    invalidate_stock_caches(line['vendor_id'] for line in lines)
+    return cancelled
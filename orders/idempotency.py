@@ -0,0 +1,115 @@
+"""
+Idempotency-Key support for unsafe order endpoints.
+
+A client that may retry a request sends the same ``Idempotency-Key`` header
+each time. The first request runs the view and stores its response; retries
+within ``IDEMPOTENCY_KEY_TTL`` get the stored response back from one lookup
+instead of placing or cancelling the order again. A request holds its key
+for ``IDEMPOTENCY_LEASE_TIMEOUT`` while it runs, so a key left behind by a
+crashed worker is taken over by the next retry rather than blocking it.
+"""
+import hashlib
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+PURGE_BATCH_SIZE = 1000
+
+
+def request_fingerprint(request):
+    """Hash what makes a request distinct, so a key reused for a different request is caught."""
+    digest = hashlib.sha256()
+    for part in (request.method, request.get_full_path(), request.body):
+        digest.update(part if isinstance(part, bytes) else part.encode())
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def idempotent(view):
+    """
+    Make a DRF view replay its stored response to requests repeating an
+    ``Idempotency-Key``. Reusing a key for a different request is refused with
+    422, and a retry arriving while the first request still runs gets 409,
+    until the first request's lease lapses and the retry takes over. Server
+    errors are not stored, so the request can be retried with the same key.
+    Requests without the header are handled as before.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key or not request.user.is_authenticated:
+            return view(request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return Response({'error': f'{IDEMPOTENCY_HEADER} must be at most {MAX_KEY_LENGTH} characters'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        fingerprint = request_fingerprint(request)
+        now = timezone.now()
+        locked_until = now + timedelta(seconds=settings.IDEMPOTENCY_LEASE_TIMEOUT)
+        record = IdempotencyKey.objects.filter(user=request.user, key=key).first()
+        if record is not None and record.expires_at <= now:
+            record.delete()
+            record = None
+
+        if record is not None:
+            if record.fingerprint != fingerprint:
+                return Response({'error': f'{IDEMPOTENCY_HEADER} was already used for a different request'},
+                                status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+            if record.status == 'completed':
+                response = Response(record.response_body, status=record.response_status)
+                response['Idempotent-Replayed'] = 'true'
+                return response
+            # Only one retry can take over a lapsed lease; the rest still see the key as held
+            claimed = IdempotencyKey.objects.filter(
+                pk=record.pk, status='in_progress', locked_until__lte=now,
+            ).update(locked_until=locked_until)
+            if not claimed:
+                return Response({'error': 'A request with this key is still being processed'},
+                                status=status.HTTP_409_CONFLICT)
+        else:
+            try:
+                with transaction.atomic():
+                    record = IdempotencyKey.objects.create(
+                        user=request.user, key=key, fingerprint=fingerprint, locked_until=locked_until,
+                        expires_at=now + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL),
+                    )
+            except IntegrityError:
+                # A concurrent request with the same key claimed it first
+                return Response({'error': 'A request with this key is still being processed'},
+                                status=status.HTTP_409_CONFLICT)
+
+        # Matching on the lease leaves the key alone if a retry has taken it over meanwhile
+        claim = IdempotencyKey.objects.filter(pk=record.pk, status='in_progress', locked_until=locked_until)
+        try:
+            response = view(request, *args, **kwargs)
+        except Exception:
+            claim.delete()
+            raise
+        if response.status_code >= 500:
+            claim.delete()
+        else:
+            claim.update(status='completed', response_status=response.status_code,
+                         response_body=response.data, locked_until=None)
+        return response
+
+    return wrapper
+
+
+def purge_expired_keys(batch_size=PURGE_BATCH_SIZE):
+    """Delete expired keys a batch at a time. Returns the number deleted."""
+    purged = 0
+    now = timezone.now()
+    while True:
+        batch = list(IdempotencyKey.objects.filter(expires_at__lte=now).values_list('pk', flat=True)[:batch_size])
+        if not batch:
+            return purged
+        purged += IdempotencyKey.objects.filter(pk__in=batch).delete()[0]
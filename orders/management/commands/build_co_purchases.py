@@ -0,0 +1,98 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from orders.models import CoPurchaseRun, Order, OrderItem
+from products.models import ProductCoPurchase
+
+# Orders that did not go through do not count as buying products together
+EXCLUDED_STATUSES = ('cancelled', 'refunded')
+
+# Orders younger than this may still be committing out of id order, so the next run picks them up
+SETTLE_TIME = timedelta(minutes=1)
+
+
+def count_pairs(first_order_id, last_order_id):
+    """``{(product_id, related_product_id): orders}`` for orders with ids in (first, last]."""
+    pairs = OrderItem.objects.filter(
+        order_id__gt=first_order_id, order_id__lte=last_order_id
+    ).exclude(
+        order__status__in=EXCLUDED_STATUSES
+    ).annotate(
+        related_product_id=F('order__items__product_id')
+    ).filter(
+        Q(related_product_id__lt=F('product_id')) | Q(related_product_id__gt=F('product_id'))
+    ).values(
+        'product_id', 'related_product_id'
+    ).annotate(
+        orders=Count('order_id', distinct=True)
+    ).order_by()
+    return {(row['product_id'], row['related_product_id']): row['orders'] for row in pairs}
+
+
+def add_pair_counts(counts):
+    """Add ``counts`` to the stored pair counts with one upsert."""
+    existing = ProductCoPurchase.objects.filter(
+        product_id__in={product_id for product_id, _ in counts},
+        related_product_id__in={related_id for _, related_id in counts},
+    ).values_list('product_id', 'related_product_id', 'count')
+    for product_id, related_id, count in existing:
+        if (product_id, related_id) in counts:
+            counts[product_id, related_id] += count
+
+    ProductCoPurchase.objects.bulk_create(
+        [
+            ProductCoPurchase(product_id=product_id, related_product_id=related_id, count=count)
+            for (product_id, related_id), count in counts.items()
+        ],
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=['product', 'related_product'],
+        update_fields=['count', 'updated_at'],
+    )
+
+
+class Command(BaseCommand):
+    help = 'Count how often products are bought together, from orders placed since the last run'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true', help='Discard stored counts and recount every order')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Orders counted per transaction')
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            with transaction.atomic():
+                ProductCoPurchase.objects.all().delete()
+                CoPurchaseRun.objects.all().delete()
+
+        last_run = CoPurchaseRun.objects.first()
+        cursor = last_run.last_order_id if last_run else 0
+        orders = Order.objects.filter(created_at__lt=timezone.now() - SETTLE_TIME).order_by('pk')
+        run = None
+
+        while True:
+            order_ids = list(orders.filter(pk__gt=cursor).values_list('pk', flat=True)[:max(options['batch_size'], 1)])
+            if not order_ids:
+                break
+
+            counts = count_pairs(cursor, order_ids[-1])
+            with transaction.atomic():
+                if counts:
+                    add_pair_counts(dict(counts))
+                if run is None:
+                    run = CoPurchaseRun(last_order_id=order_ids[-1])
+                run.last_order_id = order_ids[-1]
+                run.orders_processed += len(order_ids)
+                run.pairs_updated += len(counts)
+                run.save()
+            cursor = order_ids[-1]
+
+        if run is None:
+            self.stdout.write('No new orders since the last run')
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f'Counted {run.orders_processed} orders, updated {run.pairs_updated} product pairs'
+        ))
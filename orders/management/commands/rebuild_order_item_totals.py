@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from orders.models import Order, OrderItem
+
+
+class Command(BaseCommand):
+    help = 'Recalculate the stored item count and total quantity of every order from its items'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Orders updated per statement')
+
+    def handle(self, *args, **options):
+        items = OrderItem.objects.filter(order=OuterRef('pk')).order_by().values('order')
+        totals = {
+            'item_count': Coalesce(Subquery(items.annotate(total=Count('id')).values('total')), Value(0)),
+            'total_quantity': Coalesce(Subquery(items.annotate(total=Sum('quantity')).values('total')), Value(0)),
+        }
+
+        updated, last_id = 0, 0
+        while True:
+            batch = list(
+                Order.objects.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:options['batch_size']]
+            )
+            if not batch:
+                break
+            updated += Order.objects.filter(pk__in=batch).update(**totals)
+            last_id = batch[-1]
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt item totals for {updated} orders'))
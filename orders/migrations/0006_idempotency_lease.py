@@ -0,0 +1,18 @@
+# Generated by Django 5.0.7 on 2026-10-17 01:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0005_order_item_totals'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='idempotencykey',
+            name='locked_until',
+            field=models.DateTimeField(blank=True, help_text="When an in-progress request's claim lapses and a retry may take over", null=True),
+        ),
+    ]
@@ -1,5 +1,8 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
+from django.core.serializers.json import DjangoJSONEncoder
 from django.core.validators import MinValueValidator
+from django.utils import timezone
 from authentication.models import User
 from products.models import Product
 
@@ -57,6 +60,10 @@ class Order(models.Model):
     estimated_delivery_date = models.DateField(blank=True, null=True)
     tracking_number = models.CharField(max_length=100, blank=True, null=True)
 
+    # Item totals, maintained by OrderItem writes
+    item_count = models.PositiveIntegerField(default=0, editable=False)
+    total_quantity = models.PositiveIntegerField(default=0, editable=False)
+
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -75,7 +82,16 @@ class Order(models.Model):
 
     @property
     def total_items(self):
-        return sum(item.quantity for item in self.items.all())
+        return self.total_quantity
+
+    @classmethod
+    def adjust_item_totals(cls, order_id, lines=0, quantity=0):
+        """Apply an item change to the stored line count and quantity (and updated_at) in a single UPDATE."""
+        cls.objects.filter(pk=order_id).update(
+            item_count=F('item_count') + lines,
+            total_quantity=F('total_quantity') + quantity,
+            updated_at=timezone.now(),
+        )
 
     class Meta:
         ordering = ['-created_at']
@@ -83,6 +99,7 @@ class Order(models.Model):
             models.Index(fields=['user', 'status']),
             models.Index(fields=['order_number']),
             models.Index(fields=['created_at']),
+            models.Index(fields=['user', 'created_at']),
         ]
 
 
@@ -113,7 +130,21 @@ class OrderItem(models.Model):
     def save(self, *args, **kwargs):
         if not self.total_price:
             self.total_price = self.unit_price * self.quantity
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            previous = None
+            if self.pk:
+                previous = OrderItem.objects.filter(pk=self.pk).values_list('order_id', 'quantity').first()
+            super().save(*args, **kwargs)
+            if previous is None:
+                Order.adjust_item_totals(self.order_id, lines=1, quantity=self.quantity)
+                return
+            previous_order_id, previous_quantity = previous
+            if previous_order_id != self.order_id:
+                # An item moved to another order leaves the old order's totals as well
+                Order.adjust_item_totals(previous_order_id, lines=-1, quantity=-previous_quantity)
+                Order.adjust_item_totals(self.order_id, lines=1, quantity=self.quantity)
+            elif previous_quantity != self.quantity:
+                Order.adjust_item_totals(self.order_id, quantity=self.quantity - previous_quantity)
 
     class Meta:
         ordering = ['-created_at']
@@ -176,3 +207,46 @@ class VendorOrderNotification(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+
+
+class CoPurchaseRun(models.Model):
+    """A build_co_purchases run; the latest one marks where the next run resumes."""
+    last_order_id = models.PositiveBigIntegerField()
+    orders_processed = models.PositiveIntegerField(default=0)
+    pairs_updated = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Co-purchase run up to order {self.last_order_id}"
+
+    class Meta:
+        ordering = ['-created_at']
+
+
+class IdempotencyKey(models.Model):
+    """The stored outcome of a request sent with an ``Idempotency-Key`` header, replayed to retries."""
+    STATUS_CHOICES = [
+        ('in_progress', 'In Progress'),
+        ('completed', 'Completed'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='idempotency_keys')
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64, help_text="SHA-256 of the request method, path and body")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='in_progress')
+    response_status = models.PositiveSmallIntegerField(blank=True, null=True)
+    response_body = models.JSONField(blank=True, null=True, encoder=DjangoJSONEncoder)
+    locked_until = models.DateTimeField(blank=True, null=True,
+                                        help_text="When an in-progress request's claim lapses and a retry may take over")
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.user.username}: {self.key}"
+
+    class Meta:
+        unique_together = ['user', 'key']
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['expires_at']),
+        ]
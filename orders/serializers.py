@@ -1,8 +1,12 @@
+from django.db import transaction
 from rest_framework import serializers
 from .models import Order, OrderItem, OrderStatusHistory, TransactionLog, VendorOrderNotification
-from products.models import Product, CartItem
+from products.inventory import InsufficientStock, invalidate_stock_caches, take_stock
+from products.models import Product, CartItem, StockReservation
+from products.reservations import with_availability
 from products.serializers import ProductListSerializer
 from authentication.models import User
+from eventmanagement.serializers import DynamicFieldsMixin
 
 
 class OrderItemSerializer(serializers.ModelSerializer):
@@ -43,7 +47,9 @@ class TransactionLogSerializer(serializers.ModelSerializer):
         read_only_fields = ('created_at',)
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    expandable_fields = ('items', 'status_history', 'transactions')
+
     user = serializers.StringRelatedField(read_only=True)
     items = OrderItemSerializer(many=True, read_only=True)
     status_history = OrderStatusHistorySerializer(many=True, read_only=True)
@@ -80,85 +86,108 @@ class OrderCreateSerializer(serializers.ModelSerializer):
         if not value:
             raise serializers.ValidationError("Order must contain at least one item")
 
+        # Repeated products are merged into one line
+        quantities = {}
         for item in value:
             if 'product_id' not in item or 'quantity' not in item:
                 raise serializers.ValidationError("Each item must have product_id and quantity")
-
             try:
-                product = Product.objects.get(id=item['product_id'])
-                if not product.is_available:
-                    raise serializers.ValidationError(f"Product {product.name} is not available")
-                if item['quantity'] > product.stock_quantity:
-                    raise serializers.ValidationError(f"Insufficient stock for {product.name}")
-            except Product.DoesNotExist:
-                raise serializers.ValidationError(f"Product with id {item['product_id']} does not exist")
-
-        return value
+                product_id, quantity = int(item['product_id']), int(item['quantity'])
+            except (TypeError, ValueError):
+                raise serializers.ValidationError("product_id and quantity must be integers")
+            if quantity <= 0:
+                raise serializers.ValidationError("Quantity must be greater than 0")
+            quantities[product_id] = quantities.get(product_id, 0) + quantity
+
+        self._products = self.load_products(quantities)
+        return [{'product_id': product_id, 'quantity': quantity} for product_id, quantity in quantities.items()]
+
+    def load_products(self, quantities):
+        """
+        Fetch every ordered product with its vendor in one query and check it can
+        be sold, leaving aside stock other shoppers have reserved.
+        """
+        user = self.context['request'].user
+        products = with_availability(Product.objects.select_related('vendor'), user=user).in_bulk(quantities)
+        for product_id, quantity in quantities.items():
+            product = products.get(product_id)
+            if product is None:
+                raise serializers.ValidationError(f"Product with id {product_id} does not exist")
+            if not product.is_available:
+                raise serializers.ValidationError(f"Product {product.name} is not available")
+            if quantity > product.available:
+                raise serializers.ValidationError(f"Insufficient stock for {product.name}")
+        return products
 
     def create(self, validated_data):
         items_data = validated_data.pop('items', [])
         use_cart = validated_data.pop('use_cart', False)
         user = self.context['request'].user
+        quantities = {item['product_id']: item['quantity'] for item in items_data}
+        products = self._products
 
         # If use_cart is True, get items from user's cart
         if use_cart:
-            cart_items = CartItem.objects.filter(user=user)
-            if not cart_items.exists():
+            quantities = dict(CartItem.objects.filter(user=user).values_list('product_id', 'quantity'))
+            if not quantities:
                 raise serializers.ValidationError("Cart is empty")
-            items_data = [{'product_id': item.product.id, 'quantity': item.quantity} for item in cart_items]
+            products = self.load_products(quantities)
 
-        # Calculate total amount
-        total_amount = 0
-        for item_data in items_data:
-            product = Product.objects.get(id=item_data['product_id'])
-            total_amount += product.price * item_data['quantity']
-
-        validated_data['total_amount'] = total_amount
+        validated_data['total_amount'] = sum(
+            products[product_id].price * quantity for product_id, quantity in quantities.items()
+        )
         validated_data['user'] = user
+        # Items are bulk created without save(), so their totals are set on the order here
+        validated_data['item_count'] = len(quantities)
+        validated_data['total_quantity'] = sum(quantities.values())
+
+        # Stock for every line is taken in one guarded UPDATE; a shortfall rolls back the whole order
+        with transaction.atomic():
+            order = Order.objects.create(**validated_data)
+            OrderItem.objects.bulk_create([
+                OrderItem(
+                    order=order,
+                    product=products[product_id],
+                    vendor=products[product_id].vendor,
+                    quantity=quantity,
+                    unit_price=products[product_id].price,
+                    total_price=products[product_id].price * quantity
+                )
+                for product_id, quantity in quantities.items()
+            ])
 
-        # Create order
-        order = Order.objects.create(**validated_data)
+            try:
+                take_stock(quantities, user=user, order=order)
+            except InsufficientStock as exc:
+                names = ', '.join(products[product_id].name for product_id in exc.product_ids)
+                raise serializers.ValidationError({'items': f"Insufficient stock for {names}"})
 
-        # Create order items
-        for item_data in items_data:
-            product = Product.objects.get(id=item_data['product_id'])
-            OrderItem.objects.create(
-                order=order,
-                product=product,
-                vendor=product.vendor,
-                quantity=item_data['quantity'],
-                unit_price=product.price,
-                total_price=product.price * item_data['quantity']
-            )
+            # The stock is sold now, so the buyer's holds on it are consumed
+            StockReservation.objects.filter(user=user, product_id__in=quantities).delete()
 
-            # Reduce stock quantity
-            product.stock_quantity -= item_data['quantity']
-            if product.stock_quantity <= 0:
-                product.status = 'out_of_stock'
-            product.save()
+            # Clear cart if use_cart was True
+            if use_cart:
+                CartItem.objects.filter(user=user).delete()
 
-        # Clear cart if use_cart was True
-        if use_cart:
-            CartItem.objects.filter(user=user).delete()
-
-        # Create initial status history
-        OrderStatusHistory.objects.create(
-            order=order,
-            status='pending',
-            notes='Order created',
-            changed_by=user
-        )
+            # Create initial status history
+            OrderStatusHistory.objects.create(
+                order=order,
+                status='pending',
+                notes='Order created',
+                changed_by=user
+            )
 
+        invalidate_stock_caches(product.vendor_id for product in products.values())
         return order
 
 
-class OrderListSerializer(serializers.ModelSerializer):
+class OrderListSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     total_items = serializers.ReadOnlyField()
 
     class Meta:
         model = Order
         fields = ['id', 'order_number', 'status', 'total_amount', 'payment_method',
-                 'payment_status', 'total_items', 'created_at', 'estimated_delivery_date']
+                 'payment_status', 'item_count', 'total_items', 'created_at', 'estimated_delivery_date']
 
 
 class OrderStatusUpdateSerializer(serializers.ModelSerializer):
@@ -210,11 +239,28 @@ class VendorOrderSerializer(serializers.ModelSerializer):
                  'vendor_items', 'total_items', 'created_at', 'notes']
 
     def get_vendor_items(self, obj):
-        vendor = self.context['request'].user
-        vendor_items = obj.items.filter(vendor=vendor)
+        vendor_items = getattr(obj, 'vendor_order_items', None)
+        if vendor_items is None:
+            vendor_items = obj.items.filter(vendor=self.context['request'].user)
         return OrderItemSerializer(vendor_items, many=True).data
 
 
+class BulkCancelSerializer(serializers.Serializer):
+    order_ids = serializers.ListField(child=serializers.IntegerField(), required=False, max_length=5000)
+    vendor_id = serializers.IntegerField(required=False)
+    delivery_date = serializers.DateField(required=False)
+    reason = serializers.CharField(max_length=500, required=False, default='Cancelled by admin')
+
+    def validate(self, attrs):
+        if bool(attrs.get('order_ids')) == ('vendor_id' in attrs):
+            raise serializers.ValidationError("Provide either order_ids or vendor_id")
+        if 'delivery_date' in attrs and 'vendor_id' not in attrs:
+            raise serializers.ValidationError({'delivery_date': "Only applies together with vendor_id"})
+        if 'vendor_id' in attrs and not User.objects.filter(pk=attrs['vendor_id'], role='vendor').exists():
+            raise serializers.ValidationError({'vendor_id': "Vendor not found"})
+        return attrs
+
+
 class VendorOrderNotificationSerializer(serializers.ModelSerializer):
     order = OrderListSerializer(read_only=True)
     vendor = serializers.StringRelatedField(read_only=True)
@@ -0,0 +1,13 @@
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from .models import Order, OrderItem
+
+
+@receiver(post_delete, sender=OrderItem)
+def remove_item_totals(sender, instance, **kwargs):
+    """Take a deleted item out of its order's stored totals."""
+    origin = kwargs.get('origin')
+    if isinstance(origin, Order) or getattr(origin, 'model', None) is Order:
+        return  # the order itself is being deleted
+    Order.adjust_item_totals(instance.order_id, lines=-1, quantity=-instance.quantity)
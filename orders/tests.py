@@ -1,3 +1,124 @@
-from django.test import TestCase
+import threading
+from unittest import mock
 
-# Create your tests here.
+from django.db import connection
+from django.db.models import Value
+from django.test import TransactionTestCase
+from rest_framework.test import APIClient
+
+from authentication.models import User
+from products.models import Product
+from .models import Order, OrderItem
+
+
+ORDER_DETAILS = {
+    'shipping_address': '12 Park Street',
+    'shipping_city': 'Kolkata',
+    'shipping_state': 'West Bengal',
+    'shipping_postal_code': '700016',
+    'contact_phone': '9876543210',
+    'contact_email': 'buyer@example.com',
+    'payment_method': 'cod',
+}
+
+
+class ConcurrentCheckoutTests(TransactionTestCase):
+    """Parallel checkouts of the same product must never sell more than is in stock."""
+
+    stock = 5
+    buyers = 12
+
+    def setUp(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest('Threads need a file-backed SQLite test database to share')
+
+        vendor = User.objects.create_user('vendor', 'vendor@example.com', 'pass', role='vendor')
+        self.product = Product.objects.create(
+            vendor=vendor, name='Wedding Buffet', description='Buffet for 100 guests', price='15000.00',
+            category='catering', stock_quantity=self.stock, status='active',
+        )
+        self.users = [
+            User.objects.create_user(f'buyer{i}', f'buyer{i}@example.com', 'pass') for i in range(self.buyers)
+        ]
+
+    def checkout(self, user, quantity, barrier, results):
+        client = APIClient()
+        client.force_authenticate(user)
+        try:
+            barrier.wait()
+            response = client.post('/api/orders/', {
+                **ORDER_DETAILS,
+                'items': [{'product_id': self.product.id, 'quantity': quantity}],
+            }, format='json')
+            results.append(response.status_code)
+        finally:
+            connection.close()
+
+    def run_checkouts(self, quantity):
+        barrier = threading.Barrier(self.buyers)
+        results = []
+        threads = [
+            threading.Thread(target=self.checkout, args=(user, quantity, barrier, results)) for user in self.users
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def assert_not_oversold(self, quantity, results):
+        self.product.refresh_from_db()
+        sold = sum(OrderItem.objects.filter(product=self.product).values_list('quantity', flat=True))
+        placed = results.count(201)
+
+        self.assertEqual(len(results), self.buyers)
+        self.assertEqual(placed * quantity, sold)
+        self.assertEqual(Order.objects.count(), placed)
+        self.assertLessEqual(sold, self.stock)
+        self.assertEqual(self.product.stock_quantity, self.stock - sold)
+        self.assertTrue(all(code in (201, 400) for code in results), results)
+        return sold
+
+    def test_parallel_checkouts_sell_out_exactly(self):
+        results = self.run_checkouts(quantity=1)
+        sold = self.assert_not_oversold(1, results)
+
+        self.assertEqual(sold, self.stock)
+        self.assertEqual(self.product.status, 'out_of_stock')
+
+    def test_parallel_multi_unit_checkouts_leave_remainder(self):
+        results = self.run_checkouts(quantity=2)
+        sold = self.assert_not_oversold(2, results)
+
+        self.assertEqual(sold, 4)
+        self.assertEqual(self.product.stock_quantity, 1)
+
+    def test_failed_line_rolls_back_whole_order(self):
+        short = Product.objects.create(
+            vendor=self.product.vendor, name='Flower Arch', description='Rose arch', price='5000.00',
+            category='florist', stock_quantity=1, status='active',
+        )
+
+        def stale_availability(queryset, user=None):
+            # Validation saw stock another buyer has taken since, so only the decrement catches it
+            return queryset.annotate(available=Value(self.stock))
+
+        client = APIClient()
+        client.force_authenticate(self.users[0])
+        with mock.patch('orders.serializers.with_availability', side_effect=stale_availability):
+            response = client.post('/api/orders/', {
+                **ORDER_DETAILS,
+                'items': [
+                    {'product_id': self.product.id, 'quantity': 2},
+                    {'product_id': short.id, 'quantity': 3},
+                ],
+            }, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Insufficient stock for Flower Arch', str(response.data))
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(OrderItem.objects.exists())
+        self.product.refresh_from_db()
+        short.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, self.stock)
+        self.assertEqual(short.stock_quantity, 1)
@@ -17,4 +17,5 @@ urlpatterns = [
     # Statistics and analytics
     path('stats/', views.order_stats, name='order_stats'),
     path('admin/analytics/', views.admin_order_analytics, name='admin_order_analytics'),
+    path('admin/bulk-cancel/', views.bulk_cancel_orders, name='bulk_cancel_orders'),
 ]
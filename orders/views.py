@@ -2,27 +2,38 @@ from rest_framework import generics, permissions, status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from django.db.models import Q, Sum, Count
+from django.db.models import Q, Sum, Count, OuterRef, Prefetch, Subquery
 from django.shortcuts import get_object_or_404
+from django.utils.decorators import method_decorator
 from django.utils import timezone
 
+from .cancellation import CANCEL_BATCH_SIZE, NON_CANCELLABLE_STATUSES, cancel_orders
+from .idempotency import idempotent
 from .models import Order, OrderItem, OrderStatusHistory, TransactionLog, VendorOrderNotification
+from products.models import Product
 from .serializers import (
     OrderSerializer, OrderCreateSerializer, OrderListSerializer,
     OrderStatusUpdateSerializer, VendorOrderSerializer,
-    VendorOrderNotificationSerializer, OrderItemSerializer
+    VendorOrderNotificationSerializer, OrderItemSerializer, BulkCancelSerializer
 )
 from authentication.permissions import IsAdminUser, IsVendorUser, IsOwnerOrAdmin
+from eventmanagement.conditional import versioned_condition
+from eventmanagement.pagination import KeysetPagination
 
 
 class OrderListCreateView(generics.ListCreateAPIView):
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
 
     def get_serializer_class(self):
         if self.request.method == 'POST':
             return OrderCreateSerializer
         return OrderListSerializer
 
+    @method_decorator(idempotent)
+    def post(self, request, *args, **kwargs):
+        return super().post(request, *args, **kwargs)
+
     def get_queryset(self):
         user = self.request.user
         if user.is_admin:
@@ -38,15 +49,52 @@ class OrderListCreateView(generics.ListCreateAPIView):
         return queryset.order_by('-created_at')
 
 
+def _order_detail_version(request, pk):
+    """
+    Version of an order payload from its own row plus the newest change to the
+    items, products, status history and transactions it embeds, in one query.
+    """
+    orders = Order.objects.filter(pk=pk)
+    if not request.user.is_admin:
+        orders = orders.filter(user=request.user)
+
+    def latest(queryset, field):
+        return Subquery(queryset.order_by(f'-{field}').values(field)[:1])
+
+    state = orders.annotate(
+        items_updated=latest(OrderItem.objects.filter(order=OuterRef('pk')), 'updated_at'),
+        products_updated=latest(Product.objects.filter(order_items__order=OuterRef('pk')), 'updated_at'),
+        history_created=latest(OrderStatusHistory.objects.filter(order=OuterRef('pk')), 'created_at'),
+        transactions_created=latest(TransactionLog.objects.filter(order=OuterRef('pk')), 'created_at'),
+    ).values_list('updated_at', 'items_updated', 'products_updated', 'history_created', 'transactions_created').first()
+    if state is None:
+        return None
+    return pk, max(timestamp for timestamp in state if timestamp is not None)
+
+
+ORDER_RELATION_PREFETCHES = {
+    'items': Prefetch('items', queryset=OrderItem.objects.select_related('product__vendor', 'vendor')),
+    'status_history': Prefetch('status_history', queryset=OrderStatusHistory.objects.select_related('changed_by')),
+    'transactions': Prefetch('transactions', queryset=TransactionLog.objects.select_related('processed_by')),
+}
+
+
 class OrderDetailView(generics.RetrieveAPIView):
     serializer_class = OrderSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
         user = self.request.user
-        if user.is_admin:
-            return Order.objects.all()
-        return Order.objects.filter(user=user)
+        queryset = Order.objects.select_related('user')
+        if not user.is_admin:
+            queryset = queryset.filter(user=user)
+
+        expanded = OrderSerializer.expanded_fields(self.request)
+        return queryset.prefetch_related(*[ORDER_RELATION_PREFETCHES[name] for name in sorted(expanded)])
+
+    @method_decorator(versioned_condition(_order_detail_version))
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
 
 
 class OrderStatusUpdateView(APIView):
@@ -81,13 +129,20 @@ class OrderStatusUpdateView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+def vendor_orders_queryset(vendor):
+    """Orders containing ``vendor``'s items, with the buyer and those items loaded up front."""
+    return Order.objects.filter(items__vendor=vendor).distinct().select_related('user').prefetch_related(
+        Prefetch('items', queryset=OrderItem.objects.filter(vendor=vendor).select_related('product__vendor', 'vendor'),
+                 to_attr='vendor_order_items')
+    )
+
+
 class VendorOrdersView(generics.ListAPIView):
     serializer_class = VendorOrderSerializer
     permission_classes = [IsVendorUser]
 
     def get_queryset(self):
-        vendor = self.request.user
-        queryset = Order.objects.filter(items__vendor=vendor).distinct()
+        queryset = vendor_orders_queryset(self.request.user)
 
         # Filter by status
         status_filter = self.request.query_params.get('status', None)
@@ -102,8 +157,7 @@ class VendorOrderDetailView(generics.RetrieveAPIView):
     permission_classes = [IsVendorUser]
 
     def get_queryset(self):
-        vendor = self.request.user
-        return Order.objects.filter(items__vendor=vendor).distinct()
+        return vendor_orders_queryset(self.request.user)
 
 
 @api_view(['GET'])
@@ -190,6 +244,7 @@ def vendor_notifications(request):
 
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
+@idempotent
 def cancel_order(request, pk):
     """Cancel an order"""
     user = request.user
@@ -202,39 +257,45 @@ def cancel_order(request, pk):
     except Order.DoesNotExist:
         return Response({'error': 'Order not found'}, status=status.HTTP_404_NOT_FOUND)
 
-    # Check if order can be cancelled
-    if order.status in ['delivered', 'cancelled', 'refunded']:
+    if not cancel_orders([order.pk], user, request.data.get('reason', 'Cancelled by user')):
+        order.refresh_from_db(fields=['status'])
         return Response(
             {'error': f'Cannot cancel order with status: {order.status}'},
             status=status.HTTP_400_BAD_REQUEST
         )
 
-    # Update order status
-    order.status = 'cancelled'
-    order.save()
-
-    # Restore product stock
-    for item in order.items.all():
-        product = item.product
-        product.stock_quantity += item.quantity
-        if product.status == 'out_of_stock' and product.stock_quantity > 0:
-            product.status = 'active'
-        product.save()
-
-    # Create status history
-    OrderStatusHistory.objects.create(
-        order=order,
-        status='cancelled',
-        notes=request.data.get('reason', 'Cancelled by user'),
-        changed_by=user
-    )
-
     return Response({
         'message': 'Order cancelled successfully',
-        'order': OrderSerializer(order).data
+        'order': {'id': order.pk, 'order_number': order.order_number, 'status': 'cancelled'}
     })
 
 
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+@idempotent
+def bulk_cancel_orders(request):
+    """Cancel many orders at once, by id or by vendor and delivery date"""
+    serializer = BulkCancelSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    data = serializer.validated_data
+
+    if data.get('order_ids'):
+        orders = Order.objects.filter(pk__in=data['order_ids'])
+    else:
+        orders = Order.objects.filter(items__vendor_id=data['vendor_id'])
+        if data.get('delivery_date'):
+            orders = orders.filter(estimated_delivery_date=data['delivery_date'])
+    order_ids = list(
+        orders.exclude(status__in=NON_CANCELLABLE_STATUSES).order_by('pk').values_list('pk', flat=True).distinct()
+    )
+
+    cancelled = []
+    for start in range(0, len(order_ids), CANCEL_BATCH_SIZE):
+        cancelled.extend(cancel_orders(order_ids[start:start + CANCEL_BATCH_SIZE], request.user, data['reason']))
+
+    return Response({'cancelled': len(cancelled), 'order_ids': cancelled})
+
+
 @api_view(['GET'])
 @permission_classes([IsAdminUser])
 def admin_order_analytics(request):
@@ -1,5 +1,11 @@
 from django.contrib import admin
-from .models import Product, ProductImage, ProductReview, CartItem, Wishlist, Category
+from django.db import transaction
+
+from .inventory import build_stock_update, invalidate_stock_caches
+from .models import (
+    Product, ProductImage, ProductReview, CartItem, Wishlist, Category, Tag, ProductCoPurchase, StockReservation,
+    StockMovement
+)
 
 
 @admin.register(Category)
@@ -10,6 +16,13 @@ class CategoryAdmin(admin.ModelAdmin):
     readonly_fields = ('created_at', 'updated_at')
 
 
+@admin.register(Tag)
+class TagAdmin(admin.ModelAdmin):
+    list_display = ('name', 'created_at')
+    search_fields = ('name',)
+    readonly_fields = ('created_at',)
+
+
 class ProductImageInline(admin.TabularInline):
     model = ProductImage
     extra = 1
@@ -20,7 +33,7 @@ class ProductAdmin(admin.ModelAdmin):
     list_display = ('name', 'vendor', 'category', 'price', 'stock_quantity', 'status', 'is_featured', 'created_at')
     list_filter = ('category', 'status', 'is_featured', 'created_at')
     search_fields = ('name', 'description', 'sku', 'vendor__username')
-    readonly_fields = ('created_at', 'updated_at')
+    readonly_fields = ('average_rating', 'rating_count', 'rating_histogram', 'created_at', 'updated_at')
     inlines = [ProductImageInline]
 
     fieldsets = (
@@ -36,12 +49,28 @@ class ProductAdmin(admin.ModelAdmin):
         ('Status & Visibility', {
             'fields': ('status', 'is_featured')
         }),
+        ('Reviews', {
+            'fields': ('average_rating', 'rating_count', 'rating_histogram')
+        }),
         ('Timestamps', {
             'fields': ('created_at', 'updated_at'),
             'classes': ('collapse',)
         }),
     )
 
+    def get_readonly_fields(self, request, obj=None):
+        # Stock of an existing product is corrected through a stock movement, so orders in between are kept
+        if obj is not None:
+            return (*self.readonly_fields, 'stock_quantity')
+        return self.readonly_fields
+
+    def save_model(self, request, obj, form, change):
+        if change:
+            # Only the edited fields are saved so the rest of the row cannot be written back from the form
+            obj.save(update_fields=[*form.changed_data, 'updated_at'])
+        else:
+            super().save_model(request, obj, form, change)
+
 
 @admin.register(ProductReview)
 class ProductReviewAdmin(admin.ModelAdmin):
@@ -65,3 +94,54 @@ class WishlistAdmin(admin.ModelAdmin):
     list_filter = ('added_at',)
     search_fields = ('user__username', 'product__name')
     readonly_fields = ('added_at',)
+
+
+@admin.register(ProductCoPurchase)
+class ProductCoPurchaseAdmin(admin.ModelAdmin):
+    list_display = ('product', 'related_product', 'count', 'updated_at')
+    search_fields = ('product__name', 'related_product__name')
+    raw_id_fields = ('product', 'related_product')
+    readonly_fields = ('updated_at',)
+
+
+@admin.register(StockReservation)
+class StockReservationAdmin(admin.ModelAdmin):
+    list_display = ('user', 'product', 'quantity', 'expires_at', 'created_at')
+    list_filter = ('expires_at',)
+    search_fields = ('user__username', 'product__name')
+    raw_id_fields = ('user', 'product')
+    readonly_fields = ('created_at',)
+
+
+@admin.register(StockMovement)
+class StockMovementAdmin(admin.ModelAdmin):
+    list_display = ('product', 'quantity', 'reason', 'order', 'created_by', 'created_at')
+    list_filter = ('reason', 'created_at')
+    search_fields = ('product__name', 'product__sku', 'order__order_number')
+    raw_id_fields = ('product', 'order', 'created_by')
+    readonly_fields = ('created_at',)
+
+    def get_fields(self, request, obj=None):
+        # Adding a movement is how stock is corrected by hand; recorded movements are only viewed
+        if obj is None:
+            return ('product', 'quantity')
+        return super().get_fields(request, obj)
+
+    def save_model(self, request, obj, form, change):
+        with transaction.atomic():
+            product = Product.objects.select_for_update().only('stock_quantity', 'vendor_id').get(pk=obj.product_id)
+            Product.objects.filter(pk=product.pk).update(**build_stock_update([
+                {'id': product.pk, 'stock_delta': obj.quantity}
+            ]))
+            # Stock does not go below zero, so the movement records what was actually applied
+            obj.quantity = max(product.stock_quantity + obj.quantity, 0) - product.stock_quantity
+            obj.reason = 'adjustment'
+            obj.created_by = request.user
+            obj.save()
+        invalidate_stock_caches([product.vendor_id])
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,173 @@
+"""
+Bulk product import for vendors, keyed by SKU.
+
+Rows are streamed from CSV or JSON Lines (plain JSON arrays are loaded whole)
+and processed in chunks: one query resolves the chunk's existing SKUs, rows are
+validated in memory, and the chunk is written with one bulk_create and one
+bulk_update inside a transaction. Stock levels are recorded as import
+movements in the stock audit log. A JSON Lines line that does not parse is
+reported as a row error; any other read error stops the import, keeping the
+chunks already written and reporting the error alongside them.
+"""
+import codecs
+import csv
+import json
+from itertools import islice
+
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import serializers
+
+from eventmanagement.cache import invalidate
+from .inventory import record_stock_changes
+from .models import Product, ProductTag
+from .stats import invalidate_vendor_stats
+
+IMPORT_FIELDS = ('sku', 'name', 'description', 'price', 'category', 'stock_quantity',
+                 'weight', 'dimensions', 'tags', 'is_featured')
+DEFAULT_CHUNK_SIZE = 500
+
+
+class ProductImportRowSerializer(serializers.ModelSerializer):
+    # Declared explicitly so validation does not run a uniqueness query per row
+    sku = serializers.CharField(max_length=100)
+
+    class Meta:
+        model = Product
+        fields = IMPORT_FIELDS
+
+
+class RowError:
+    """Yielded by a reader in place of a row it could not parse, so the import can carry on."""
+
+    def __init__(self, message):
+        self.message = message
+
+
+def read_csv_rows(file):
+    for row in csv.DictReader(codecs.iterdecode(file, 'utf-8-sig')):
+        yield {key.strip(): value.strip() for key, value in row.items() if key and value not in (None, '')}
+
+
+def read_json_lines(file):
+    for line in codecs.iterdecode(file, 'utf-8-sig'):
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as exc:
+                yield RowError(f'Invalid JSON: {exc}')
+
+
+def read_json_rows(file):
+    rows = json.loads(file.read().decode('utf-8-sig'))
+    if not isinstance(rows, list):
+        raise ValueError('JSON import must be a list of product objects')
+    yield from rows
+
+
+READERS = {
+    'csv': read_csv_rows,
+    'jsonl': read_json_lines,
+    'json': read_json_rows,
+}
+
+
+def detect_format(filename):
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    return 'jsonl' if extension == 'ndjson' else extension
+
+
+def import_products(vendor, rows, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Create or update ``vendor``'s products from an iterable of row dicts.
+    Returns created/updated counts and a per-row error report. If reading
+    fails partway through, the rows read so far are still imported and the
+    report carries the read error under ``error``.
+    """
+    report = {'created': 0, 'updated': 0, 'errors': []}
+    seen_skus = set()
+    rows = enumerate(rows, start=1)
+
+    while True:
+        chunk, error = _read_chunk(rows, chunk_size)
+        if chunk:
+            _import_chunk(vendor, chunk, seen_skus, report)
+        if error is not None:
+            report['error'] = f'Could not read file: {error}'
+            break
+        if not chunk:
+            break
+
+    if report['created'] or report['updated']:
+        invalidate('featured_products')
+        invalidate('product_facets')
+        invalidate_vendor_stats(vendor.pk)
+    return report
+
+
+def _read_chunk(rows, chunk_size):
+    chunk = []
+    try:
+        chunk.extend(islice(rows, chunk_size))
+    except (ValueError, csv.Error) as exc:
+        # UnicodeDecodeError and JSONDecodeError are ValueErrors
+        return chunk, exc
+    return chunk, None
+
+
+def _import_chunk(vendor, chunk, seen_skus, report):
+    skus = {str(row.get('sku', '')).strip() for _, row in chunk if isinstance(row, dict)}
+    existing = {product.sku: product for product in Product.objects.filter(sku__in=skus)}
+    now = timezone.now()
+    to_create, to_update, stock_set = [], [], set()
+
+    for number, row in chunk:
+        if isinstance(row, RowError):
+            report['errors'].append({'row': number, 'sku': None, 'errors': [row.message]})
+            continue
+        if not isinstance(row, dict):
+            report['errors'].append({'row': number, 'sku': None, 'errors': ['Row must be an object']})
+            continue
+
+        sku = str(row.get('sku', '')).strip()
+        product = existing.get(sku)
+        if product is not None and product.vendor_id != vendor.pk:
+            report['errors'].append({'row': number, 'sku': sku, 'errors': ['SKU belongs to another vendor']})
+            continue
+        if sku in seen_skus:
+            report['errors'].append({'row': number, 'sku': sku, 'errors': ['Duplicate SKU in import']})
+            continue
+
+        serializer = ProductImportRowSerializer(product, data=row, partial=product is not None)
+        if not serializer.is_valid():
+            report['errors'].append({'row': number, 'sku': sku or None, 'errors': serializer.errors})
+            continue
+        seen_skus.add(sku)
+
+        if product is None:
+            to_create.append(Product(vendor=vendor, **serializer.validated_data))
+        else:
+            for field, value in serializer.validated_data.items():
+                setattr(product, field, value)
+            product.updated_at = now
+            to_update.append(product)
+            if 'stock_quantity' in serializer.validated_data:
+                stock_set.add(product.pk)
+
+    with transaction.atomic():
+        created = Product.objects.bulk_create(to_create)
+        before = {}
+        if to_update:
+            # Rows without a stock level keep the current one rather than the copy read above
+            before = dict(Product.objects.filter(pk__in=[product.pk for product in to_update])
+                          .select_for_update().values_list('pk', 'stock_quantity'))
+            for product in to_update:
+                if product.pk not in stock_set:
+                    product.stock_quantity = before[product.pk]
+        Product.objects.bulk_update(to_update, [field for field in IMPORT_FIELDS if field != 'sku'] + ['updated_at'])
+        record_stock_changes(before, {product.pk: product.stock_quantity for product in created + to_update},
+                             'import', user=vendor)
+        ProductTag.sync(created + to_update)
+
+    report['created'] += len(created)
+    report['updated'] += len(to_update)
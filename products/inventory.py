@@ -0,0 +1,199 @@
+"""
+Set-based stock and price updates for a vendor's catalog, and the stock
+audit log behind them.
+
+Every stock write updates ``Product.stock_quantity`` under the row lock and
+records the change as a ``StockMovement`` in the same transaction, so a
+product's movements always sum to its stock and show who changed it and why.
+"""
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, IntegerField, OuterRef, Q, Value, When
+from django.db.models.functions import Greatest
+from django.db.models.lookups import GreaterThan
+from django.utils import timezone
+
+from eventmanagement.cache import invalidate
+from .models import Product, StockMovement, StockReservation
+from .stats import invalidate_vendor_stats
+
+BULK_UPDATE_BATCH_SIZE = 500
+
+
+def _item_lookup(item):
+    return Q(pk=item['id']) if 'id' in item else Q(sku=item['sku'])
+
+
+def _stock_expression(item):
+    if 'stock_quantity' in item:
+        return Value(item['stock_quantity'], output_field=IntegerField())
+    return Greatest(F('stock_quantity') + item['stock_delta'], 0, output_field=IntegerField())
+
+
+def build_stock_update(items):
+    """
+    Column expressions applying every item in one UPDATE. Each item only
+    touches the row it names, and ``status`` follows the new stock level
+    between active and out_of_stock while other statuses are left alone.
+    """
+    stock_items = [item for item in items if 'stock_quantity' in item or 'stock_delta' in item]
+    price_items = [item for item in items if 'price' in item]
+    values = {'updated_at': timezone.now()}
+
+    if stock_items:
+        values['stock_quantity'] = Case(
+            *[When(_item_lookup(item), then=_stock_expression(item)) for item in stock_items],
+            default=F('stock_quantity'),
+            output_field=IntegerField(),
+        )
+        # SET expressions read the old row, so the status test repeats the stock expression
+        toggles = Q(status__in=('active', 'out_of_stock'))
+        values['status'] = Case(
+            *[When(toggles & _item_lookup(item), then=Case(
+                When(GreaterThan(_stock_expression(item), 0), then=Value('active')),
+                default=Value('out_of_stock'),
+            )) for item in stock_items],
+            default=F('status'),
+        )
+
+    if price_items:
+        values['price'] = Case(
+            *[When(_item_lookup(item), then=Value(item['price'])) for item in price_items],
+            default=F('price'),
+            output_field=DecimalField(max_digits=10, decimal_places=2),
+        )
+    return values
+
+
+def apply_stock_updates(vendor, items, batch_size=BULK_UPDATE_BATCH_SIZE):
+    """
+    Apply validated stock/price items to ``vendor``'s products, one UPDATE per
+    batch, and record the stock changes as adjustment movements. Items naming
+    a product the vendor does not own are reported as not found. Returns the
+    updated product ids and the unmatched items.
+    """
+    updated_ids, not_found = [], []
+
+    for start in range(0, len(items), batch_size):
+        batch = items[start:start + batch_size]
+        ids = [item['id'] for item in batch if 'id' in item]
+        skus = [item['sku'] for item in batch if 'sku' in item]
+        owned = Product.objects.filter(vendor=vendor).filter(Q(pk__in=ids) | Q(sku__in=skus))
+
+        with transaction.atomic():
+            matched = list(owned.select_for_update().order_by().values_list('pk', 'sku'))
+            matched_ids = {pk for pk, _ in matched}
+            matched_skus = {sku for _, sku in matched if sku is not None}
+            found = []
+            for item in batch:
+                if ('id' in item and item['id'] in matched_ids) or ('sku' in item and item['sku'] in matched_skus):
+                    found.append(item)
+                else:
+                    not_found.append({key: item[key] for key in ('id', 'sku') if key in item})
+            if found:
+                products = Product.objects.filter(pk__in=matched_ids)
+                before = dict(products.values_list('pk', 'stock_quantity'))
+                products.update(**build_stock_update(found))
+                record_stock_changes(before, dict(products.values_list('pk', 'stock_quantity')),
+                                     'adjustment', user=vendor)
+                updated_ids.extend(matched_ids)
+
+    if updated_ids:
+        invalidate_stock_caches([vendor.pk])
+    return updated_ids, not_found
+
+
+class InsufficientStock(Exception):
+    """Some of the requested products do not have enough stock left."""
+
+    def __init__(self, product_ids):
+        super().__init__(product_ids)
+        self.product_ids = product_ids
+
+
+def take_stock(quantities, user=None, order=None):
+    """
+    Decrement the stock of active products by ``{product_id: quantity}`` in one
+    conditional UPDATE, marking products it empties out_of_stock and recording
+    an order movement per product. Quantity held by other users' unexpired
+    reservations is not available to ``user``. Either every product has
+    enough left and all are decremented, or nothing changes and
+    InsufficientStock names the products that fell short.
+    """
+    held = StockReservation.held_quantity(OuterRef('pk'), exclude_user=user)
+    guard = Q()
+    for product_id, quantity in quantities.items():
+        guard |= Q(pk=product_id, stock_quantity__gte=held + quantity)
+
+    with transaction.atomic():
+        taken = Product.objects.filter(guard, status='active').update(
+            stock_quantity=Case(
+                *[When(pk=product_id, then=F('stock_quantity') - quantity) for product_id, quantity in quantities.items()],
+                default=F('stock_quantity'),
+                output_field=IntegerField(),
+            ),
+            status=Case(
+                *[When(pk=product_id, stock_quantity=quantity, then=Value('out_of_stock'))
+                  for product_id, quantity in quantities.items()],
+                default=F('status'),
+            ),
+            updated_at=timezone.now(),
+        )
+        if taken == len(quantities):
+            StockMovement.objects.bulk_create([
+                StockMovement(product_id=product_id, quantity=-quantity, reason='order', order=order, created_by=user)
+                for product_id, quantity in quantities.items()
+            ])
+            return
+        transaction.set_rollback(True)
+
+    available = dict(
+        Product.objects.filter(pk__in=quantities, status='active')
+        .annotate(available=F('stock_quantity') - held).values_list('pk', 'available')
+    )
+    raise InsufficientStock([
+        product_id for product_id, quantity in quantities.items() if available.get(product_id, 0) < quantity
+    ])
+
+
+def restock(lines, reason, user=None):
+    """
+    Return stock with one movement per line and one grouped UPDATE of the
+    products, which also revives sold-out products and bumps updated_at.
+    ``lines`` are mappings with ``product_id``, ``quantity`` and optionally
+    ``order_id``.
+    """
+    totals = {}
+    for line in lines:
+        totals[line['product_id']] = totals.get(line['product_id'], 0) + line['quantity']
+    if not totals:
+        return
+    with transaction.atomic():
+        Product.objects.filter(pk__in=totals).update(**build_stock_update([
+            {'id': product_id, 'stock_delta': total} for product_id, total in totals.items()
+        ]))
+        StockMovement.objects.bulk_create([
+            StockMovement(product_id=line['product_id'], quantity=line['quantity'], order_id=line.get('order_id'),
+                          reason=reason, created_by=user)
+            for line in lines
+        ])
+
+
+def record_stock_changes(before, after, reason, user=None):
+    """
+    Record stock levels written directly to the snapshot as movements.
+    ``before`` and ``after`` map product ids to their stock; read ``before``
+    under the row lock so the log still sums to the snapshot.
+    """
+    StockMovement.objects.bulk_create([
+        StockMovement(product_id=product_id, quantity=stock - before.get(product_id, 0), reason=reason,
+                      created_by=user)
+        for product_id, stock in after.items() if stock != before.get(product_id, 0)
+    ])
+
+
+def invalidate_stock_caches(vendor_ids):
+    """Outdate cached responses after stock changed outside of ``Product.save``."""
+    invalidate('featured_products')
+    invalidate('product_facets')
+    for vendor_id in set(vendor_ids):
+        invalidate_vendor_stats(vendor_id)
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from authentication.models import User
+from products.importers import DEFAULT_CHUNK_SIZE, READERS, detect_format, import_products
+
+
+class Command(BaseCommand):
+    help = 'Create or update a vendor\'s products from a CSV, JSON or JSON Lines file keyed by SKU'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File to import')
+        parser.add_argument('--vendor', required=True, help='Username of the vendor that owns the products')
+        parser.add_argument('--format', choices=sorted(READERS), help='File format, detected from the extension by default')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='Rows validated and written per batch')
+
+    def handle(self, *args, **options):
+        try:
+            vendor = User.objects.get(username=options['vendor'], role='vendor')
+        except User.DoesNotExist:
+            raise CommandError(f'Vendor "{options["vendor"]}" does not exist')
+
+        file_format = options['format'] or detect_format(options['path'])
+        if file_format not in READERS:
+            raise CommandError('Unsupported file format, use --format csv, json or jsonl')
+
+        try:
+            with open(options['path'], 'rb') as file:
+                report = import_products(vendor, READERS[file_format](file), chunk_size=max(options['chunk_size'], 1))
+        except OSError as exc:
+            raise CommandError(str(exc))
+
+        for error in report['errors']:
+            self.stderr.write(f"Row {error['row']} ({error['sku'] or 'no sku'}): {error['errors']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {report['created']}, updated {report['updated']}, rejected {len(report['errors'])} rows"
+        ))
+        if 'error' in report:
+            raise CommandError(report['error'])
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from products.reservations import REAP_BATCH_SIZE, reap_expired_reservations
+
+
+class Command(BaseCommand):
+    help = 'Delete expired checkout stock reservations in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=REAP_BATCH_SIZE,
+                            help='Reservations deleted per statement')
+
+    def handle(self, *args, **options):
+        reaped = reap_expired_reservations(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Reaped {reaped} expired stock reservations'))
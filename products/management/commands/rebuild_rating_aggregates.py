@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from products.models import RATING_VALUES, Product, ProductReview, rating_average_expression
+
+
+class Command(BaseCommand):
+    help = 'Recalculate the stored rating sum, count, average and star histogram of every product from its reviews'
+
+    def handle(self, *args, **options):
+        reviews = ProductReview.objects.filter(product=OuterRef('pk')).order_by().values('product')
+        histogram = {
+            f'rating_{stars}_count': Coalesce(
+                Subquery(reviews.annotate(total=Count('id', filter=Q(rating=stars))).values('total')), Value(0)
+            )
+            for stars in RATING_VALUES
+        }
+
+        with transaction.atomic():
+            updated = Product.objects.update(
+                rating_sum=Coalesce(Subquery(reviews.annotate(total=Sum('rating')).values('total')), Value(0)),
+                rating_count=Coalesce(Subquery(reviews.annotate(total=Count('id')).values('total')), Value(0)),
+                **histogram,
+            )
+            Product.objects.update(
+                average_rating=rating_average_expression(F('rating_sum'), F('rating_count'))
+            )
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt rating aggregates for {updated} products'))
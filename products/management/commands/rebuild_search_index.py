@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from products import search
+
+
+class Command(BaseCommand):
+    help = 'Create the product full-text search index if needed and repopulate it from the product table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database',
+            default=DEFAULT_DB_ALIAS,
+            help='Database to rebuild the index on',
+        )
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        if not search.supports_search_index(connection):
+            raise CommandError('This database backend does not support the SQLite FTS5 search index')
+
+        search.install_search_index(connection)
+        search.rebuild_search_index(connection)
+        self.stdout.write(self.style.SUCCESS('Rebuilt product search index'))
@@ -0,0 +1,29 @@
+# Generated by Django 5.0.7 on 2026-10-17 01:18
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def copy_primary_images(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+    ProductImage = apps.get_model('products', 'ProductImage')
+    primary = ProductImage.objects.filter(
+        product=OuterRef('pk'), is_primary=True
+    ).order_by('created_at').values('image')[:1]
+    Product.objects.update(primary_image=Subquery(primary))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0005_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='primary_image',
+            field=models.ImageField(blank=True, editable=False, help_text='Copy of the primary ProductImage, maintained on image writes', null=True, upload_to='product_images/'),
+        ),
+        migrations.RunPython(copy_primary_images, migrations.RunPython.noop),
+    ]
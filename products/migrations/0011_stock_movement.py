@@ -0,0 +1,48 @@
+# Generated by Django 5.0.7 on 2026-10-17 01:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def record_opening_balances(apps, schema_editor):
+    # Existing stock enters the ledger as one applied movement per product
+    Product = apps.get_model('products', 'Product')
+    StockMovement = apps.get_model('products', 'StockMovement')
+    StockMovement.objects.bulk_create(
+        (
+            StockMovement(product_id=product_id, quantity=stock, reason='adjustment', is_compacted=True)
+            for product_id, stock in Product.objects.filter(stock_quantity__gt=0).values_list('pk', 'stock_quantity')
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0003_co_purchase_run'),
+        ('products', '0010_stock_reservation'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.IntegerField(help_text='Signed change in stock')),
+                ('reason', models.CharField(choices=[('order', 'Order'), ('cancel', 'Cancellation'), ('adjustment', 'Adjustment'), ('import', 'Import')], max_length=20)),
+                ('is_compacted', models.BooleanField(default=False, help_text='Already reflected in the stock snapshot')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stock_movements', to=settings.AUTH_USER_MODEL)),
+                ('order', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stock_movements', to='orders.order')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_movements', to='products.product')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['product', 'is_compacted'], name='products_st_product_c26366_idx'), models.Index(fields=['product', '-created_at'], name='products_st_product_3ae061_idx')],
+            },
+        ),
+        migrations.RunPython(record_opening_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.0.7 on 2026-10-17 01:59
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def copy_primary_image_variants(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+    ProductImage = apps.get_model('products', 'ProductImage')
+    primary = ProductImage.objects.filter(
+        product=OuterRef('pk'), is_primary=True
+    ).order_by('created_at').values('image_variants')[:1]
+    Product.objects.update(primary_image_variants=Coalesce(Subquery(primary), Value({}, models.JSONField())))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0011_stock_movement'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='primary_image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.RunPython(copy_primary_image_variants, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.0.7 on 2026-10-17 02:06
+
+from django.db import migrations
+from django.db.models import Case, F, IntegerField, Sum, Value, When
+from django.db.models.functions import Greatest
+
+
+def fold_pending_movements(apps, schema_editor):
+    # Movements still pending are added to the stock before the flag goes away
+    Product = apps.get_model('products', 'Product')
+    StockMovement = apps.get_model('products', 'StockMovement')
+    totals = StockMovement.objects.filter(is_compacted=False).order_by().values('product').annotate(total=Sum('quantity'))
+    for row in totals:
+        stock = Greatest(F('stock_quantity') + row['total'], 0, output_field=IntegerField())
+        Product.objects.filter(pk=row['product']).update(
+            stock_quantity=stock,
+            status=Case(
+                When(status='out_of_stock', stock_quantity__gt=-row['total'], then=Value('active')),
+                When(status='active', stock_quantity__lte=-row['total'], then=Value('out_of_stock')),
+                default=F('status'),
+            ),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0012_product_primary_image_variants'),
+    ]
+
+    operations = [
+        migrations.RunPython(fold_pending_movements, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='stockmovement',
+            name='products_st_product_c26366_idx',
+        ),
+        migrations.RemoveField(
+            model_name='stockmovement',
+            name='is_compacted',
+        ),
+    ]
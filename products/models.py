@@ -1,12 +1,38 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count, F, FloatField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Cast, Coalesce, NullIf, Round
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.utils import timezone
 from authentication.models import User
 
 
+def parse_tags(value):
+    """Split a comma separated tag string into unique, normalized tag names."""
+    names = []
+    for raw in (value or '').split(','):
+        name = raw.strip().lower()[:50]
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+RATING_VALUES = range(1, 6)
+
+
+def rating_average_expression(rating_sum, rating_count):
+    """SQL expression for a two-decimal average that evaluates to 0 when there are no ratings."""
+    return Coalesce(
+        Round(Cast(rating_sum, FloatField()) / NullIf(rating_count, Value(0)), 2),
+        Value(0.0),
+        output_field=FloatField(),
+    )
+
+
 class Category(models.Model):
     name = models.CharField(max_length=100, unique=True)
     description = models.TextField(blank=True, null=True)
     image = models.ImageField(upload_to='category_images/', blank=True, null=True)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -38,6 +64,7 @@ class Product(models.Model):
         ('lighting', 'Lighting'),
     ])
     image = models.ImageField(upload_to='product_images/', blank=True, null=True)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     stock_quantity = models.PositiveIntegerField(default=0)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending_approval')
     sku = models.CharField(max_length=100, unique=True, blank=True, null=True)
@@ -45,6 +72,20 @@ class Product(models.Model):
     dimensions = models.CharField(max_length=100, blank=True, null=True, help_text="L x W x H in cm")
     is_featured = models.BooleanField(default=False)
     tags = models.CharField(max_length=500, blank=True, null=True, help_text="Comma separated tags")
+    primary_image = models.ImageField(upload_to='product_images/', blank=True, null=True, editable=False,
+                                      help_text="Copy of the primary ProductImage, maintained on image writes")
+    primary_image_variants = models.JSONField(default=dict, blank=True, editable=False)
+
+    # Review aggregates, maintained by ProductReview writes
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    average_rating = models.DecimalField(max_digits=3, decimal_places=2, default=0, editable=False)
+    rating_1_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_2_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_3_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_4_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_5_count = models.PositiveIntegerField(default=0, editable=False)
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -55,18 +96,126 @@ class Product(models.Model):
     def is_available(self):
         return self.status == 'active' and self.stock_quantity > 0
 
+    @property
+    def rating_histogram(self):
+        return {str(stars): getattr(self, f'rating_{stars}_count') for stars in RATING_VALUES}
+
+    @classmethod
+    def refresh_primary_image(cls, product_id):
+        """Copy the product's primary image path and variants onto the product row and mark it modified."""
+        primary = ProductImage.objects.filter(product=OuterRef('pk'), is_primary=True).order_by('created_at')
+        cls.objects.filter(pk=product_id).update(
+            primary_image=Subquery(primary.values('image')[:1]),
+            primary_image_variants=Coalesce(Subquery(primary.values('image_variants')[:1]), Value({}, models.JSONField())),
+            updated_at=timezone.now(),
+        )
+
+    @classmethod
+    def adjust_rating(cls, product_id, added=None, removed=None):
+        """
+        Apply a review change to the stored aggregates (and updated_at) in a
+        single UPDATE: ``added`` is a rating that now counts, ``removed`` one
+        that no longer does; pass both when a review's rating changes.
+        """
+        rating_delta = (added or 0) - (removed or 0)
+        count_delta = (added is not None) - (removed is not None)
+        new_sum = F('rating_sum') + rating_delta
+        new_count = F('rating_count') + count_delta
+
+        values = {}
+        for stars, delta in ((added, 1), (removed, -1)):
+            if stars is not None:
+                field = f'rating_{stars}_count'
+                values[field] = values.get(field, F(field)) + delta
+        cls.objects.filter(pk=product_id).update(
+            rating_sum=new_sum,
+            rating_count=new_count,
+            average_rating=rating_average_expression(new_sum, new_count),
+            updated_at=timezone.now(),
+            **values,
+        )
+
     class Meta:
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['vendor', 'status']),
             models.Index(fields=['category', 'status']),
             models.Index(fields=['status', 'is_featured']),
+            models.Index(fields=['status', 'created_at']),
+            models.Index(fields=['status', 'price']),
+            models.Index(fields=['status', 'name']),
         ]
 
 
+class Tag(models.Model):
+    name = models.CharField(max_length=50, unique=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
+
+    class Meta:
+        ordering = ['name']
+
+
+class ProductTag(models.Model):
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name='product_tags')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='product_tags')
+
+    def __str__(self):
+        return f"{self.tag.name} - {self.product.name}"
+
+    @classmethod
+    def product_ids_for(cls, names, match_all=False):
+        """Subquery of product ids tagged with any (or every) one of ``names``."""
+        queryset = cls.objects.filter(tag__name__in=names)
+        if match_all:
+            queryset = queryset.values('product').annotate(
+                matched=Count('tag')
+            ).filter(matched=len(set(names)))
+        return queryset.values('product')
+
+    @classmethod
+    def sync(cls, products):
+        """Bring the tag rows of ``products`` in line with their ``tags`` strings."""
+        wanted = {product.pk: set(parse_tags(product.tags)) for product in products}
+        if not wanted:
+            return
+
+        current = {pk: set() for pk in wanted}
+        for product_id, name in cls.objects.filter(product_id__in=wanted).values_list('product_id', 'tag__name'):
+            current[product_id].add(name)
+
+        changed = {pk: names for pk, names in wanted.items() if names != current[pk]}
+        if not changed:
+            return
+
+        names = set().union(*changed.values())
+        Tag.objects.bulk_create([Tag(name=name) for name in names], ignore_conflicts=True)
+        tag_ids = dict(Tag.objects.filter(name__in=names).values_list('name', 'id'))
+
+        stale = Q(pk__in=[])
+        additions = []
+        for product_id, names in changed.items():
+            removed = current[product_id] - names
+            if removed:
+                stale |= Q(product_id=product_id, tag__name__in=removed)
+            additions.extend(
+                cls(product_id=product_id, tag_id=tag_ids[name]) for name in names - current[product_id]
+            )
+
+        with transaction.atomic():
+            cls.objects.filter(stale).delete()
+            cls.objects.bulk_create(additions, ignore_conflicts=True)
+
+    class Meta:
+        unique_together = ['tag', 'product']
+
+
 class ProductImage(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='images')
     image = models.ImageField(upload_to='product_images/')
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     alt_text = models.CharField(max_length=200, blank=True, null=True)
     is_primary = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -90,9 +239,33 @@ class ProductReview(models.Model):
     def __str__(self):
         return f"Review by {self.user.username} for {self.product.name}"
 
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            previous = None
+            if self.pk:
+                previous = ProductReview.objects.filter(pk=self.pk).values_list('product_id', 'rating').first()
+            super().save(*args, **kwargs)
+            if previous is None:
+                Product.adjust_rating(self.product_id, added=self.rating)
+                return
+            previous_product_id, previous_rating = previous
+            if previous_product_id != self.product_id:
+                # A review moved to another product leaves the old product's aggregates as well
+                from .stats import invalidate_vendor_stats
+                Product.adjust_rating(previous_product_id, removed=previous_rating)
+                Product.adjust_rating(self.product_id, added=self.rating)
+                previous_vendor_id = Product.objects.filter(pk=previous_product_id).values_list('vendor_id', flat=True).first()
+                if previous_vendor_id is not None:
+                    invalidate_vendor_stats(previous_vendor_id)
+            elif previous_rating != self.rating:
+                Product.adjust_rating(self.product_id, added=self.rating, removed=previous_rating)
+
     class Meta:
         unique_together = ['product', 'user']
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['product', 'created_at']),
+        ]
 
 
 class CartItem(models.Model):
@@ -125,3 +298,80 @@ class Wishlist(models.Model):
     class Meta:
         unique_together = ['user', 'product']
         ordering = ['-added_at']
+
+
+class ProductCoPurchase(models.Model):
+    """How many orders contained both products; maintained by the build_co_purchases command."""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='co_purchases')
+    related_product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.product_id} + {self.related_product_id} ({self.count})"
+
+    class Meta:
+        unique_together = ['product', 'related_product']
+        indexes = [
+            models.Index(fields=['product', '-count']),
+        ]
+
+
+class StockReservation(models.Model):
+    """A checkout hold on product stock that lapses at ``expires_at``."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='stock_reservations')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='reservations')
+    quantity = models.PositiveIntegerField()
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.user.username} holds {self.quantity} x {self.product.name}"
+
+    @classmethod
+    def held_quantity(cls, product, exclude_user=None):
+        """Expression for the quantity of ``product`` (e.g. an OuterRef) held by unexpired reservations."""
+        holds = cls.objects.filter(product=product, expires_at__gt=timezone.now())
+        if exclude_user is not None:
+            holds = holds.exclude(user=exclude_user)
+        total = holds.order_by().values('product').annotate(total=Sum('quantity')).values('total')
+        return Coalesce(Subquery(total), Value(0))
+
+    class Meta:
+        unique_together = ['user', 'product']
+        ordering = ['expires_at']
+        indexes = [
+            models.Index(fields=['product', 'expires_at']),
+            models.Index(fields=['expires_at']),
+        ]
+
+
+class StockMovement(models.Model):
+    """
+    Append-only record of a change to a product's stock, written alongside the
+    change to ``Product.stock_quantity`` so a product's movements sum to its stock.
+    """
+    REASON_CHOICES = [
+        ('order', 'Order'),
+        ('cancel', 'Cancellation'),
+        ('adjustment', 'Adjustment'),
+        ('import', 'Import'),
+    ]
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_movements')
+    quantity = models.IntegerField(help_text="Signed change in stock")
+    reason = models.CharField(max_length=20, choices=REASON_CHOICES)
+    order = models.ForeignKey('orders.Order', on_delete=models.SET_NULL, blank=True, null=True,
+                              related_name='stock_movements')
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, blank=True, null=True,
+                                   related_name='stock_movements')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.product.name}: {self.quantity:+d} ({self.reason})"
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['product', '-created_at']),
+        ]
@@ -0,0 +1,79 @@
+"""
+Time-limited stock holds taken during checkout.
+
+A reservation sets quantity aside for one user until it expires, so other
+shoppers see "stock minus held". Holds are rows of their own, but taking one
+locks the products' rows while availability is checked, so concurrent
+reservations of the same product queue up instead of both passing the check;
+the conditional UPDATE in ``take_stock`` remains the final guard against
+overselling.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, OuterRef
+from django.utils import timezone
+
+from .inventory import InsufficientStock
+from .models import Product, StockReservation
+
+REAP_BATCH_SIZE = 1000
+
+
+def with_availability(queryset, user=None):
+    """Annotate ``reserved`` (held by users other than ``user``) and ``available`` stock."""
+    queryset = queryset.annotate(reserved=StockReservation.held_quantity(OuterRef('pk'), exclude_user=user))
+    return queryset.annotate(available=F('stock_quantity') - F('reserved'))
+
+
+def reserve_stock(user, quantities, ttl=None):
+    """
+    Hold ``{product_id: quantity}`` for ``user``, replacing any earlier holds on
+    the same products and restarting their TTL. The product rows are locked, in
+    primary key order, before availability is read, so concurrent reservations
+    are checked one after another; on a shortfall nothing is written and
+    InsufficientStock names the products that fell short.
+    """
+    ttl = settings.STOCK_RESERVATION_TTL if ttl is None else ttl
+    expires_at = timezone.now() + timedelta(seconds=ttl)
+
+    with transaction.atomic():
+        # Sorted so two reservations over the same products cannot deadlock
+        list(Product.objects.filter(pk__in=quantities).order_by('pk').select_for_update().values_list('pk', flat=True))
+        # The user's own earlier holds are being replaced, so they do not count against them
+        available = dict(
+            with_availability(Product.objects.filter(pk__in=quantities, status='active'), user=user)
+            .values_list('pk', 'available')
+        )
+        short = [product_id for product_id, quantity in quantities.items() if quantity > available.get(product_id, 0)]
+        if short:
+            raise InsufficientStock(short)
+        return StockReservation.objects.bulk_create(
+            [
+                StockReservation(user=user, product_id=product_id, quantity=quantity, expires_at=expires_at)
+                for product_id, quantity in quantities.items()
+            ],
+            update_conflicts=True,
+            unique_fields=['user', 'product'],
+            update_fields=['quantity', 'expires_at'],
+        )
+
+
+def release_stock(user, product_ids=None):
+    """Drop ``user``'s holds, optionally only on ``product_ids``. Returns the number released."""
+    holds = StockReservation.objects.filter(user=user)
+    if product_ids is not None:
+        holds = holds.filter(product_id__in=product_ids)
+    return holds.delete()[0]
+
+
+def reap_expired_reservations(batch_size=REAP_BATCH_SIZE):
+    """Delete lapsed holds a batch at a time so no single DELETE holds locks for long."""
+    reaped = 0
+    now = timezone.now()
+    while True:
+        batch = list(StockReservation.objects.filter(expires_at__lte=now).values_list('pk', flat=True)[:batch_size])
+        if not batch:
+            return reaped
+        reaped += StockReservation.objects.filter(pk__in=batch).delete()[0]
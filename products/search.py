@@ -0,0 +1,133 @@
+"""
+Full-text search for the product catalog.
+
+On SQLite builds with FTS5 the searchable product columns are mirrored into an
+external-content virtual table that triggers keep in sync, and searches are
+answered from that index with bm25 ranking and prefix matching. Other backends
+keep the original LIKE based filtering.
+"""
+import re
+
+from django.db import connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import Product, ProductTag
+
+FTS_TABLE = 'products_product_fts'
+SEARCH_COLUMNS = ('name', 'description', 'tags')
+
+# Aliases whose database has been confirmed to carry the search index
+_index_ready = set()
+
+
+def _trigger_statements(product_table):
+    columns = ', '.join(SEARCH_COLUMNS)
+    new_values = ', '.join(f'new.{column}' for column in SEARCH_COLUMNS)
+    old_values = ', '.join(f'old.{column}' for column in SEARCH_COLUMNS)
+    return [
+        f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON {product_table} BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, {columns}) VALUES (new.id, {new_values});
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON {product_table} BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {columns}) VALUES ('delete', old.id, {old_values});
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF {columns} ON {product_table} BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {columns}) VALUES ('delete', old.id, {old_values});
+            INSERT INTO {FTS_TABLE}(rowid, {columns}) VALUES (new.id, {new_values});
+        END""",
+    ]
+
+
+def supports_search_index(connection):
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        return bool(cursor.fetchone()[0])
+
+
+def has_search_index(connection):
+    return FTS_TABLE in connection.introspection.table_names()
+
+
+def install_search_index(connection):
+    """Create the FTS5 table and its sync triggers if they do not exist yet."""
+    product_table = Product._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+            f"{', '.join(SEARCH_COLUMNS)}, content='{product_table}', content_rowid='id', "
+            f"tokenize='unicode61 remove_diacritics 2')"
+        )
+        for statement in _trigger_statements(product_table):
+            cursor.execute(statement)
+
+
+def ensure_search_triggers(connection):
+    """
+    Re-create the sync triggers. SQLite drops triggers when a migration rebuilds
+    the product table, so this runs after every migrate.
+    """
+    if connection.vendor != 'sqlite' or not has_search_index(connection):
+        return
+    with connection.cursor() as cursor:
+        for statement in _trigger_statements(Product._meta.db_table):
+            cursor.execute(statement)
+
+
+def rebuild_search_index(connection):
+    with connection.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def drop_search_index(connection):
+    with connection.cursor() as cursor:
+        for suffix in ('ai', 'ad', 'au'):
+            cursor.execute(f"DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}")
+        cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+    _index_ready.discard(connection.alias)
+
+
+def search_index_ready(using='default'):
+    if using in _index_ready:
+        return True
+    connection = connections[using]
+    if connection.vendor == 'sqlite' and has_search_index(connection):
+        _index_ready.add(using)
+        return True
+    return False
+
+
+def build_match_query(term):
+    """Turn free text into an FTS5 query that prefix-matches every word."""
+    words = re.findall(r'\w+', term)
+    if not words:
+        return None
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def search_products(queryset, term):
+    """
+    Filter ``queryset`` to products matching ``term``. When the full-text index
+    is available the results are annotated with ``search_rank`` and ordered by
+    relevance (lower bm25 scores rank higher).
+    """
+    match = build_match_query(term)
+    if match is None or not search_index_ready(queryset.db):
+        return queryset.filter(
+            Q(name__icontains=term) |
+            Q(description__icontains=term) |
+            Q(id__in=ProductTag.product_ids_for([term.strip().lower()]))
+        )
+
+    product_table = Product._meta.db_table
+    return queryset.filter(
+        id__in=RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", (match,))
+    ).annotate(
+        search_rank=RawSQL(
+            f"SELECT bm25({FTS_TABLE}) FROM {FTS_TABLE} "
+            f"WHERE {FTS_TABLE} MATCH %s AND rowid = {product_table}.id",
+            (match,)
+        )
+    ).order_by('search_rank', '-created_at')
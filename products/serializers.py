@@ -1,16 +1,38 @@
+from decimal import Decimal
+
+from django.db import transaction
 from rest_framework import serializers
-from .models import Product, ProductImage, ProductReview, CartItem, Wishlist, Category
+from .models import (
+    Product, ProductImage, ProductReview, CartItem, Wishlist, Category, Tag, ProductCoPurchase, StockReservation
+)
+from .inventory import record_stock_changes
 from authentication.models import User
+from eventmanagement.images import ImageVariantsField, variant_urls
+from eventmanagement.serializers import DynamicFieldsMixin
+
+REVIEW_PREVIEW_SIZE = 5
 
 
 class CategorySerializer(serializers.ModelSerializer):
+    image_variants = ImageVariantsField()
+
     class Meta:
         model = Category
         fields = '__all__'
         read_only_fields = ('created_at', 'updated_at')
 
 
+class TagSerializer(serializers.ModelSerializer):
+    product_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Tag
+        fields = ['id', 'name', 'product_count']
+
+
 class ProductImageSerializer(serializers.ModelSerializer):
+    image_variants = ImageVariantsField()
+
     class Meta:
         model = ProductImage
         fields = '__all__'
@@ -31,28 +53,31 @@ class ProductReviewSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    expandable_fields = ('images', 'reviews')
+
     vendor = serializers.StringRelatedField(read_only=True)
     vendor_id = serializers.IntegerField(write_only=True, required=False)
     images = ProductImageSerializer(many=True, read_only=True)
-    reviews = ProductReviewSerializer(many=True, read_only=True)
-    average_rating = serializers.SerializerMethodField()
-    total_reviews = serializers.SerializerMethodField()
+    reviews = serializers.SerializerMethodField()
+    image_variants = ImageVariantsField()
+    average_rating = serializers.FloatField(read_only=True)
+    total_reviews = serializers.IntegerField(source='rating_count', read_only=True)
+    rating_histogram = serializers.ReadOnlyField()
     is_available = serializers.ReadOnlyField()
 
     class Meta:
         model = Product
-        fields = '__all__'
+        exclude = ('rating_sum', 'rating_count', 'rating_1_count', 'rating_2_count', 'rating_3_count',
+                   'rating_4_count', 'rating_5_count', 'primary_image_variants')
         read_only_fields = ('created_at', 'updated_at')
 
-    def get_average_rating(self, obj):
-        reviews = obj.reviews.all()
-        if reviews:
-            return round(sum(review.rating for review in reviews) / len(reviews), 2)
-        return 0.0
-
-    def get_total_reviews(self, obj):
-        return obj.reviews.count()
+    def get_reviews(self, obj):
+        """Most recent reviews only; the full list is paginated at /products/<id>/reviews/."""
+        reviews = getattr(obj, 'recent_reviews', None)
+        if reviews is None:
+            reviews = obj.reviews.select_related('user')[:REVIEW_PREVIEW_SIZE]
+        return ProductReviewSerializer(reviews, many=True, context=self.context).data
 
     def create(self, validated_data):
         request = self.context.get('request')
@@ -60,37 +85,65 @@ class ProductSerializer(serializers.ModelSerializer):
             validated_data['vendor'] = request.user
         return super().create(validated_data)
 
+    def update(self, instance, validated_data):
+        # Only the edited fields are saved so a stale stock copy cannot undo orders and movements
+        update_fields = [*validated_data, 'updated_at']
+        if 'stock_quantity' not in validated_data:
+            for attr, value in validated_data.items():
+                setattr(instance, attr, value)
+            instance.save(update_fields=update_fields)
+            return instance
+
+        with transaction.atomic():
+            before = Product.objects.select_for_update().values_list('stock_quantity', flat=True).get(pk=instance.pk)
+            # Reload under the lock so the response reflects the row as written, not the copy read before it
+            instance.refresh_from_db()
+            for attr, value in validated_data.items():
+                setattr(instance, attr, value)
+            instance.save(update_fields=update_fields)
+            request = self.context.get('request')
+            record_stock_changes({instance.pk: before}, {instance.pk: instance.stock_quantity}, 'adjustment',
+                                 user=request.user if request else None)
+        return instance
+
 
-class ProductListSerializer(serializers.ModelSerializer):
+class ProductListSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     vendor = serializers.StringRelatedField(read_only=True)
-    average_rating = serializers.SerializerMethodField()
-    total_reviews = serializers.SerializerMethodField()
+    average_rating = serializers.FloatField(read_only=True)
+    total_reviews = serializers.IntegerField(source='rating_count', read_only=True)
     is_available = serializers.ReadOnlyField()
     primary_image = serializers.SerializerMethodField()
+    primary_image_variants = serializers.SerializerMethodField()
+    image_variants = ImageVariantsField()
 
     class Meta:
         model = Product
-        fields = ['id', 'name', 'price', 'category', 'vendor', 'image', 'primary_image',
-                 'stock_quantity', 'status', 'is_featured', 'average_rating',
+        fields = ['id', 'name', 'price', 'category', 'vendor', 'image', 'image_variants', 'primary_image',
+                 'primary_image_variants', 'stock_quantity', 'status', 'is_featured', 'average_rating',
                  'total_reviews', 'is_available', 'created_at']
 
-    def get_average_rating(self, obj):
-        reviews = obj.reviews.all()
-        if reviews:
-            return round(sum(review.rating for review in reviews) / len(reviews), 2)
-        return 0.0
-
-    def get_total_reviews(self, obj):
-        return obj.reviews.count()
-
     def get_primary_image(self, obj):
-        primary_image = obj.images.filter(is_primary=True).first()
-        if primary_image:
+        if obj.primary_image:
             request = self.context.get('request')
             if request:
-                return request.build_absolute_uri(primary_image.image.url)
+                return request.build_absolute_uri(obj.primary_image.url)
         return None
 
+    def get_primary_image_variants(self, obj):
+        variants = obj.primary_image_variants
+        # Variants rendered from a replaced image are left out until the new ones are stored
+        if not obj.primary_image or variants.get('source') != obj.primary_image.name:
+            return {}
+        return variant_urls(variants, self.context.get('request'))
+
+
+class ProductCoPurchaseSerializer(serializers.ModelSerializer):
+    product = ProductListSerializer(source='related_product', read_only=True)
+
+    class Meta:
+        model = ProductCoPurchase
+        fields = ['product', 'count']
+
 
 class CartItemSerializer(serializers.ModelSerializer):
     user = serializers.StringRelatedField(read_only=True)
@@ -144,6 +197,79 @@ class WishlistSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Product does not exist")
 
 
+class CartBatchItemSerializer(serializers.Serializer):
+    product_id = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1)
+
+
+class CartBatchSerializer(serializers.Serializer):
+    items = CartBatchItemSerializer(many=True, required=False, default=list, max_length=500)
+    remove = serializers.ListField(child=serializers.IntegerField(), required=False, default=list, max_length=500)
+
+    def validate(self, attrs):
+        product_ids = [item['product_id'] for item in attrs['items']]
+        if not product_ids and not attrs['remove']:
+            raise serializers.ValidationError("Provide items to add or product ids to remove")
+        if len(set(product_ids)) != len(product_ids):
+            raise serializers.ValidationError({'items': "Each product may appear only once"})
+        if set(product_ids) & set(attrs['remove']):
+            raise serializers.ValidationError("A product cannot be both updated and removed")
+
+        products = Product.objects.in_bulk(product_ids)
+        errors = {}
+        for product_id in product_ids:
+            product = products.get(product_id)
+            if product is None:
+                errors[product_id] = "Product does not exist"
+            elif not product.is_available:
+                errors[product_id] = "Product is not available"
+        if errors:
+            raise serializers.ValidationError({'items': errors})
+        return attrs
+
+
+class StockReservationSerializer(serializers.ModelSerializer):
+    product_id = serializers.IntegerField(read_only=True)
+    product_name = serializers.CharField(source='product.name', read_only=True)
+
+    class Meta:
+        model = StockReservation
+        fields = ['product_id', 'product_name', 'quantity', 'expires_at']
+
+
+class ReservationRequestSerializer(serializers.Serializer):
+    items = CartBatchItemSerializer(many=True, allow_empty=False, max_length=100)
+
+    def validate_items(self, value):
+        product_ids = [item['product_id'] for item in value]
+        if len(set(product_ids)) != len(product_ids):
+            raise serializers.ValidationError("Each product may appear only once")
+
+        products = Product.objects.in_bulk(product_ids)
+        errors = {}
+        for product_id in product_ids:
+            product = products.get(product_id)
+            if product is None:
+                errors[product_id] = "Product does not exist"
+            elif not product.is_available:
+                errors[product_id] = "Product is not available"
+        if errors:
+            raise serializers.ValidationError(errors)
+        return value
+
+
+class ProductAvailabilitySerializer(serializers.ModelSerializer):
+    reserved = serializers.IntegerField(read_only=True)
+    available = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Product
+        fields = ['id', 'stock_quantity', 'reserved', 'available']
+
+    def get_available(self, obj):
+        return max(obj.available, 0)
+
+
 class VendorProductStatsSerializer(serializers.Serializer):
     total_products = serializers.IntegerField()
     active_products = serializers.IntegerField()
@@ -151,3 +277,36 @@ class VendorProductStatsSerializer(serializers.Serializer):
     out_of_stock_products = serializers.IntegerField()
     total_reviews = serializers.IntegerField()
     average_rating = serializers.FloatField()
+
+
+class ProductStockSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Product
+        fields = ['id', 'sku', 'stock_quantity', 'price', 'status']
+
+
+class BulkStockUpdateItemSerializer(serializers.Serializer):
+    id = serializers.IntegerField(required=False)
+    sku = serializers.CharField(max_length=100, required=False)
+    stock_delta = serializers.IntegerField(required=False)
+    stock_quantity = serializers.IntegerField(min_value=0, required=False)
+    price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal('0.01'), required=False)
+
+    def validate(self, attrs):
+        if ('id' in attrs) == ('sku' in attrs):
+            raise serializers.ValidationError("Provide exactly one of id or sku")
+        if 'stock_delta' in attrs and 'stock_quantity' in attrs:
+            raise serializers.ValidationError("Provide either stock_delta or stock_quantity, not both")
+        if not {'stock_delta', 'stock_quantity', 'price'} & attrs.keys():
+            raise serializers.ValidationError("Provide stock_delta, stock_quantity or price")
+        return attrs
+
+
+class BulkStockUpdateSerializer(serializers.Serializer):
+    items = BulkStockUpdateItemSerializer(many=True, allow_empty=False, max_length=5000)
+
+    def validate_items(self, value):
+        keys = [('id', item['id']) if 'id' in item else ('sku', item['sku']) for item in value]
+        if len(set(keys)) != len(keys):
+            raise serializers.ValidationError("Each product may appear only once")
+        return value
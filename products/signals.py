@@ -0,0 +1,83 @@
+from functools import partial
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from eventmanagement.cache import invalidate
+from eventmanagement.images import schedule_variants
+from .inventory import record_stock_changes
+from .models import Category, Product, ProductImage, ProductReview, ProductTag
+from .stats import invalidate_vendor_stats
+
+
+@receiver(post_save, sender=Product)
+def sync_product_tags(sender, instance, raw=False, **kwargs):
+    """Keep the normalized tag index in step with ``Product.tags``."""
+    if not raw:
+        ProductTag.sync([instance])
+
+
+@receiver(post_save, sender=Product)
+def record_initial_stock(sender, instance, created=False, raw=False, **kwargs):
+    """Open the stock audit log of a new product with its starting stock."""
+    if created and not raw:
+        record_stock_changes({}, {instance.pk: instance.stock_quantity}, 'adjustment')
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Product)
+def generate_image_variants(sender, instance, raw=False, **kwargs):
+    if not raw:
+        schedule_variants(instance, 'image', 'image_variants')
+
+
+@receiver(post_save, sender=ProductImage)
+def generate_product_image_variants(sender, instance, raw=False, **kwargs):
+    # Product payloads embed their images, so finished variants mark the product modified
+    if not raw:
+        schedule_variants(
+            instance, 'image', 'image_variants',
+            on_stored=partial(Product.refresh_primary_image, instance.product_id)
+        )
+
+
+@receiver([post_save, post_delete], sender=ProductImage)
+def refresh_primary_image(sender, instance, raw=False, **kwargs):
+    if not raw:
+        Product.refresh_primary_image(instance.product_id)
+
+
+@receiver(post_delete, sender=ProductReview)
+def remove_review_rating(sender, instance, **kwargs):
+    """Take a deleted review out of its product's rating aggregates."""
+    Product.adjust_rating(instance.product_id, removed=instance.rating)
+
+
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=ProductImage)
+@receiver([post_save, post_delete], sender=ProductReview)
+def invalidate_featured_products(sender, **kwargs):
+    """Featured product responses embed images and ratings, so any of these writes outdates them."""
+    invalidate('featured_products')
+
+
+@receiver([post_save, post_delete], sender=Product)
+def invalidate_product_facets(sender, **kwargs):
+    invalidate('product_facets')
+
+
+@receiver([post_save, post_delete], sender=Category)
+def invalidate_categories(sender, **kwargs):
+    invalidate('categories')
+
+
+@receiver([post_save, post_delete], sender=Product)
+def invalidate_product_vendor_stats(sender, instance, **kwargs):
+    invalidate_vendor_stats(instance.vendor_id)
+
+
+@receiver([post_save, post_delete], sender=ProductReview)
+def invalidate_review_vendor_stats(sender, instance, **kwargs):
+    vendor_id = Product.objects.filter(pk=instance.product_id).values_list('vendor_id', flat=True).first()
+    if vendor_id is not None:
+        invalidate_vendor_stats(vendor_id)
@@ -0,0 +1,45 @@
+"""
+Vendor dashboard statistics, computed in one pass over the vendor's products.
+
+Stats are cached per vendor and the entry is dropped by product and review
+writes, so a vendor sees their own changes on the next load. Unlike the public
+response cache, an outdated entry is never served.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+
+from .models import Product
+
+
+def vendor_stats_key(vendor_id):
+    return f'vendor_stats:{vendor_id}'
+
+
+def invalidate_vendor_stats(vendor_id):
+    # Dropped after commit so a concurrent load cannot cache the numbers from before the write
+    transaction.on_commit(lambda: cache.delete(vendor_stats_key(vendor_id)))
+
+
+def compute_vendor_stats(vendor_id):
+    """Product status counts and review totals from one conditional aggregate query."""
+    stats = Product.objects.filter(vendor_id=vendor_id).aggregate(
+        total_products=Count('id'),
+        active_products=Count('id', filter=Q(status='active')),
+        pending_products=Count('id', filter=Q(status='pending_approval')),
+        out_of_stock_products=Count('id', filter=Q(status='out_of_stock')),
+        total_reviews=Sum('rating_count', default=0),
+        rating_sum=Sum('rating_sum', default=0),
+    )
+    rating_sum = stats.pop('rating_sum')
+    stats['average_rating'] = round(rating_sum / stats['total_reviews'], 2) if stats['total_reviews'] else 0.0
+    return stats
+
+
+def get_vendor_stats(vendor_id):
+    stats = cache.get(vendor_stats_key(vendor_id))
+    if stats is None:
+        stats = compute_vendor_stats(vendor_id)
+        cache.set(vendor_stats_key(vendor_id), stats, timeout=settings.RESPONSE_CACHE_TIMEOUT)
+    return stats
@@ -5,11 +5,16 @@ urlpatterns = [
     # Product endpoints
     path('', views.ProductListCreateView.as_view(), name='product_list_create'),
     path('<int:pk>/', views.ProductDetailView.as_view(), name='product_detail'),
+    path('<int:pk>/frequently-bought-together/', views.frequently_bought_together, name='frequently_bought_together'),
     path('featured/', views.featured_products, name='featured_products'),
+    path('facets/', views.product_facets, name='product_facets'),
+    path('availability/', views.product_availability, name='product_availability'),
 
     # Vendor specific endpoints
     path('vendor/products/', views.VendorProductsView.as_view(), name='vendor_products'),
+    path('vendor/products/bulk-update/', views.bulk_update_vendor_products, name='vendor_products_bulk_update'),
     path('vendor/stats/', views.VendorProductStatsView.as_view(), name='vendor_stats'),
+    path('vendor/import/', views.import_vendor_products, name='vendor_product_import'),
     path('vendor/<int:vendor_id>/products/', views.vendor_products, name='vendor_product_list'),
 
     # Product reviews
@@ -22,12 +27,20 @@ urlpatterns = [
     path('cart/', views.CartItemListCreateView.as_view(), name='cart_list_create'),
     path('cart/<int:pk>/', views.CartItemDetailView.as_view(), name='cart_item_detail'),
     path('cart/summary/', views.cart_summary, name='cart_summary'),
+    path('cart/batch/', views.cart_batch, name='cart_batch'),
     path('cart/clear/', views.clear_cart, name='clear_cart'),
 
+    # Checkout stock reservations
+    path('reservations/', views.stock_reservations, name='stock_reservations'),
+
     # Wishlist endpoints
+    path('membership/', views.product_membership, name='product_membership'),
     path('wishlist/', views.WishlistListCreateView.as_view(), name='wishlist_list_create'),
     path('wishlist/<int:pk>/', views.WishlistDetailView.as_view(), name='wishlist_detail'),
 
     # Categories
     path('categories/', views.CategoryListView.as_view(), name='category_list'),
+
+    # Tags
+    path('tags/', views.tag_cloud, name='tag_cloud'),
 ]
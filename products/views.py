@@ -1,65 +1,129 @@
+import json
+from decimal import Decimal
+
 from rest_framework import generics, permissions, status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from django.db.models import Q, Avg, Count
+from django.db import transaction
+from django.db.models import (
+    Q, BooleanField, Case, Count, DecimalField, F, IntegerField, Max, OuterRef, Prefetch, Subquery, Sum, Value, When
+)
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.decorators import method_decorator
 
-from .models import Product, ProductImage, ProductReview, CartItem, Wishlist, Category
+from .models import (
+    Product, ProductImage, ProductReview, CartItem, Wishlist, Category, Tag, ProductTag, ProductCoPurchase,
+    StockReservation, parse_tags
+)
+from .importers import READERS, detect_format, import_products
+from .inventory import InsufficientStock, apply_stock_updates
+from .reservations import release_stock, reserve_stock, with_availability
+from .search import search_products
+from .stats import get_vendor_stats
 from .serializers import (
     ProductSerializer, ProductListSerializer, ProductImageSerializer,
     ProductReviewSerializer, CartItemSerializer, WishlistSerializer,
-    CategorySerializer, VendorProductStatsSerializer
+    CategorySerializer, VendorProductStatsSerializer, TagSerializer,
+    BulkStockUpdateSerializer, ProductStockSerializer, CartBatchSerializer, ProductCoPurchaseSerializer,
+    StockReservationSerializer, ReservationRequestSerializer, ProductAvailabilitySerializer,
+    REVIEW_PREVIEW_SIZE
 )
 from authentication.permissions import IsVendorUser, IsAdminUser, IsOwnerOrAdmin
+from eventmanagement.cache import cached_response_data
+from eventmanagement.conditional import versioned_condition
+from eventmanagement.pagination import KeysetPagination
 
 
-class ProductListCreateView(generics.ListCreateAPIView):
-    serializer_class = ProductListSerializer
-    permission_classes = [permissions.IsAuthenticated]
+# Query parameters that narrow the product catalog (see filter_products)
+PRODUCT_FILTER_PARAMS = ('category', 'vendor_id', 'search', 'tags', 'tags_match', 'min_price', 'max_price', 'featured')
 
-    def get_queryset(self):
-        queryset = Product.objects.filter(status='active')
+# Price facet buckets as (lower bound inclusive, upper bound exclusive)
+PRICE_BUCKETS = [(None, 1000), (1000, 5000), (5000, 10000), (10000, 50000), (50000, None)]
 
-        # Filter by category
-        category = self.request.query_params.get('category', None)
-        if category:
-            queryset = queryset.filter(category=category)
 
-        # Filter by vendor
-        vendor_id = self.request.query_params.get('vendor_id', None)
-        if vendor_id:
-            queryset = queryset.filter(vendor_id=vendor_id)
+def filter_products(queryset, params):
+    """Apply the catalog filters shared by the product list and its facets"""
+    # Filter by category
+    category = params.get('category', None)
+    if category:
+        queryset = queryset.filter(category=category)
 
-        # Search functionality
-        search = self.request.query_params.get('search', None)
-        if search:
-            queryset = queryset.filter(
-                Q(name__icontains=search) |
-                Q(description__icontains=search) |
-                Q(tags__icontains=search)
-            )
+    # Filter by vendor
+    vendor_id = params.get('vendor_id', None)
+    if vendor_id:
+        queryset = queryset.filter(vendor_id=vendor_id)
+
+    # Search functionality (ranked by relevance unless an ordering is given)
+    search = params.get('search', None)
+    if search:
+        queryset = search_products(queryset, search)
+
+    # Filter by tags, matching any tag by default or every tag with tags_match=all
+    tags = parse_tags(params.get('tags', None))
+    if tags:
+        match_all = params.get('tags_match', 'any') == 'all'
+        queryset = queryset.filter(id__in=ProductTag.product_ids_for(tags, match_all=match_all))
 
-        # Filter by price range
-        min_price = self.request.query_params.get('min_price', None)
-        max_price = self.request.query_params.get('max_price', None)
-        if min_price:
-            queryset = queryset.filter(price__gte=min_price)
-        if max_price:
-            queryset = queryset.filter(price__lte=max_price)
+    # Filter by price range
+    min_price = params.get('min_price', None)
+    max_price = params.get('max_price', None)
+    if min_price:
+        queryset = queryset.filter(price__gte=min_price)
+    if max_price:
+        queryset = queryset.filter(price__lte=max_price)
+
+    # Filter featured products
+    featured = params.get('featured', None)
+    if featured == 'true':
+        queryset = queryset.filter(is_featured=True)
+
+    return queryset
+
+
+def product_list_version(queryset):
+    """Version of a product listing: how many rows match and when the newest one changed"""
+    state = queryset.order_by().aggregate(count=Count('id'), last_modified=Max('updated_at'))
+    return state['count'], state['last_modified']
+
+
+def _product_list_version(request, *args, **kwargs):
+    return product_list_version(filter_products(Product.objects.filter(status='active'), request.query_params))
+
+
+def _product_detail_version(request, pk):
+    # Image writes and rating changes bump Product.updated_at, but a review edit that keeps
+    # its rating (e.g. a moderated comment) only touches the review, so the newest one counts too
+    reviews = ProductReview.objects.filter(product=OuterRef('pk')).order_by('-updated_at')
+    state = Product.objects.filter(pk=pk).annotate(
+        reviews_updated=Subquery(reviews.values('updated_at')[:1])
+    ).values_list('updated_at', 'reviews_updated').first()
+    if state is None:
+        return None
+    return pk, max(timestamp for timestamp in state if timestamp is not None)
+
+
+class ProductListCreateView(generics.ListCreateAPIView):
+    serializer_class = ProductListSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
 
-        # Filter featured products
-        featured = self.request.query_params.get('featured', None)
-        if featured == 'true':
-            queryset = queryset.filter(is_featured=True)
+    def get_queryset(self):
+        queryset = filter_products(Product.objects.filter(status='active'), self.request.query_params)
 
         # Ordering
-        ordering = self.request.query_params.get('ordering', '-created_at')
+        search = self.request.query_params.get('search', None)
+        ordering = self.request.query_params.get('ordering', None if search else '-created_at')
         if ordering in ['price', '-price', 'name', '-name', 'created_at', '-created_at']:
             queryset = queryset.order_by(ordering)
 
         return queryset
 
+    @method_decorator(versioned_condition(_product_list_version))
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
     def get_serializer_class(self):
         if self.request.method == 'POST':
             return ProductSerializer
@@ -69,15 +133,106 @@ class ProductListCreateView(generics.ListCreateAPIView):
         serializer.save(vendor=self.request.user)
 
 
+def compute_product_facets(queryset):
+    """
+    Count products per category, vendor, price bucket and availability with a
+    single GROUP BY over all four dimensions, folded into facets in Python.
+    """
+    bucket_conditions = []
+    for index, (low, high) in enumerate(PRICE_BUCKETS):
+        condition = Q()
+        if low is not None:
+            condition &= Q(price__gte=low)
+        if high is not None:
+            condition &= Q(price__lt=high)
+        bucket_conditions.append(When(condition, then=Value(index)))
+    price_bucket = Case(*bucket_conditions, output_field=IntegerField())
+    in_stock = Case(When(stock_quantity__gt=0, then=Value(True)), default=Value(False), output_field=BooleanField())
+
+    rows = queryset.order_by().annotate(
+        price_bucket=price_bucket, in_stock=in_stock
+    ).values(
+        'category', 'vendor_id', 'vendor__username', 'price_bucket', 'in_stock'
+    ).annotate(count=Count('id'))
+
+    categories = {value: 0 for value, _ in Product._meta.get_field('category').choices}
+    vendors = {}
+    price_counts = [0] * len(PRICE_BUCKETS)
+    availability = {'in_stock': 0, 'out_of_stock': 0}
+    total = 0
+
+    for row in rows:
+        count = row['count']
+        total += count
+        categories[row['category']] = categories.get(row['category'], 0) + count
+        vendor = vendors.setdefault(row['vendor_id'], {
+            'vendor_id': row['vendor_id'], 'vendor': row['vendor__username'], 'count': 0
+        })
+        vendor['count'] += count
+        if row['price_bucket'] is not None:
+            price_counts[row['price_bucket']] += count
+        availability['in_stock' if row['in_stock'] else 'out_of_stock'] += count
+
+    return {
+        'total': total,
+        'categories': [{'value': value, 'count': count} for value, count in categories.items()],
+        'vendors': sorted(vendors.values(), key=lambda vendor: (-vendor['count'], vendor['vendor'])),
+        'price_ranges': [
+            {'min_price': low, 'max_price': high, 'count': price_counts[index]}
+            for index, (low, high) in enumerate(PRICE_BUCKETS)
+        ],
+        'availability': availability,
+    }
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def product_facets(request):
+    """Get facet counts for the product list filtered by the same query parameters"""
+    params = {
+        name: request.query_params.get(name, '').strip()
+        for name in PRODUCT_FILTER_PARAMS
+        if request.query_params.get(name, '').strip()
+    }
+    if 'tags' in params:
+        params['tags'] = ','.join(sorted(parse_tags(params['tags'])))
+
+    data = cached_response_data(
+        'product_facets',
+        json.dumps(params, sort_keys=True),
+        lambda: compute_product_facets(filter_products(Product.objects.filter(status='active'), params))
+    )
+    return Response(data)
+
+
+PRODUCT_RELATION_PREFETCHES = {
+    'images': Prefetch('images'),
+    'reviews': Prefetch(
+        'reviews',
+        queryset=ProductReview.objects.select_related('user')[:REVIEW_PREVIEW_SIZE],
+        to_attr='recent_reviews',
+    ),
+}
+
+
 class ProductDetailView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Product.objects.all()
     serializer_class = ProductSerializer
 
+    def get_queryset(self):
+        expanded = ProductSerializer.expanded_fields(self.request)
+        return Product.objects.select_related('vendor').prefetch_related(
+            *[PRODUCT_RELATION_PREFETCHES[name] for name in sorted(expanded)]
+        )
+
     def get_permissions(self):
         if self.request.method in ['PUT', 'PATCH', 'DELETE']:
             return [IsOwnerOrAdmin()]
         return [permissions.IsAuthenticated()]
 
+    @method_decorator(versioned_condition(_product_detail_version))
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
 
 class VendorProductsView(generics.ListAPIView):
     serializer_class = ProductListSerializer
@@ -97,31 +252,53 @@ class VendorProductStatsView(APIView):
     permission_classes = [IsVendorUser]
 
     def get(self, request):
-        vendor = request.user
-        products = Product.objects.filter(vendor=vendor)
-
-        stats = {
-            'total_products': products.count(),
-            'active_products': products.filter(status='active').count(),
-            'pending_products': products.filter(status='pending_approval').count(),
-            'out_of_stock_products': products.filter(status='out_of_stock').count(),
-            'total_reviews': ProductReview.objects.filter(product__vendor=vendor).count(),
-            'average_rating': ProductReview.objects.filter(product__vendor=vendor).aggregate(
-                avg_rating=Avg('rating')
-            )['avg_rating'] or 0.0
-        }
-
+        stats = get_vendor_stats(request.user.pk)
         serializer = VendorProductStatsSerializer(stats)
         return Response(serializer.data)
 
 
+@api_view(['PATCH'])
+@permission_classes([IsVendorUser])
+def bulk_update_vendor_products(request):
+    """Adjust stock and price for many of the vendor's products in one request"""
+    serializer = BulkStockUpdateSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+
+    updated_ids, not_found = apply_stock_updates(request.user, serializer.validated_data['items'])
+    products = Product.objects.filter(pk__in=updated_ids).only('id', 'sku', 'stock_quantity', 'price', 'status')
+    return Response({
+        'updated': len(updated_ids),
+        'not_found': not_found,
+        'products': ProductStockSerializer(products.order_by('id'), many=True).data,
+    })
+
+
+@api_view(['POST'])
+@permission_classes([IsVendorUser])
+def import_vendor_products(request):
+    """Create or update the vendor's products from an uploaded CSV or JSON file keyed by SKU"""
+    upload = request.FILES.get('file')
+    if upload is None:
+        return Response({'error': 'Upload a CSV or JSON file in the "file" field'}, status=status.HTTP_400_BAD_REQUEST)
+
+    file_format = request.data.get('format') or detect_format(upload.name)
+    if file_format not in READERS:
+        return Response({'error': 'Unsupported file format, use csv, json or jsonl'}, status=status.HTTP_400_BAD_REQUEST)
+
+    report = import_products(request.user, READERS[file_format](upload))
+    if 'error' in report:
+        # Chunks read before the error are already saved, so the report goes back with it
+        return Response(report, status=status.HTTP_400_BAD_REQUEST)
+    return Response(report)
+
+
 class ProductReviewListCreateView(generics.ListCreateAPIView):
     serializer_class = ProductReviewSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
         product_id = self.kwargs.get('product_id')
-        return ProductReview.objects.filter(product_id=product_id)
+        return ProductReview.objects.filter(product_id=product_id).select_related('user')
 
     def perform_create(self, serializer):
         product_id = self.kwargs.get('product_id')
@@ -143,12 +320,29 @@ class ProductImageListCreateView(generics.ListCreateAPIView):
         serializer.save(product=product)
 
 
+def cart_items_for(user):
+    return CartItem.objects.filter(user=user).select_related('user', 'product__vendor')
+
+
+def cart_totals(user):
+    """Quantity, price and line totals of the user's cart from one aggregate query"""
+    return CartItem.objects.filter(user=user).aggregate(
+        total_items=Sum('quantity', default=0),
+        total_price=Sum(
+            F('quantity') * F('product__price'),
+            output_field=DecimalField(max_digits=12, decimal_places=2),
+            default=Decimal('0.00'),
+        ),
+        items_count=Count('id'),
+    )
+
+
 class CartItemListCreateView(generics.ListCreateAPIView):
     serializer_class = CartItemSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return CartItem.objects.filter(user=self.request.user)
+        return cart_items_for(self.request.user)
 
 
 class CartItemDetailView(generics.RetrieveUpdateDestroyAPIView):
@@ -156,22 +350,36 @@ class CartItemDetailView(generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return CartItem.objects.filter(user=self.request.user)
+        return cart_items_for(self.request.user)
 
 
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def cart_summary(request):
     """Get cart summary with total items and total price"""
-    cart_items = CartItem.objects.filter(user=request.user)
-    total_items = sum(item.quantity for item in cart_items)
-    total_price = sum(item.total_price for item in cart_items)
+    return Response(cart_totals(request.user))
 
-    return Response({
-        'total_items': total_items,
-        'total_price': total_price,
-        'items_count': cart_items.count()
-    })
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def cart_batch(request):
+    """Set quantities for and remove many cart items in one transaction"""
+    serializer = CartBatchSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    items, remove = serializer.validated_data['items'], serializer.validated_data['remove']
+
+    with transaction.atomic():
+        if remove:
+            CartItem.objects.filter(user=request.user, product_id__in=remove).delete()
+        if items:
+            CartItem.objects.bulk_create(
+                [CartItem(user=request.user, product_id=item['product_id'], quantity=item['quantity']) for item in items],
+                update_conflicts=True,
+                unique_fields=['user', 'product'],
+                update_fields=['quantity', 'updated_at'],
+            )
+
+    return Response(cart_totals(request.user))
 
 
 @api_view(['DELETE'])
@@ -184,12 +392,98 @@ def clear_cart(request):
     })
 
 
+def _active_reservations(user):
+    return StockReservation.objects.filter(user=user, expires_at__gt=timezone.now()).select_related('product')
+
+
+@api_view(['GET', 'POST', 'DELETE'])
+@permission_classes([permissions.IsAuthenticated])
+def stock_reservations(request):
+    """List, place or refresh, and release the current user's checkout stock holds"""
+    if request.method == 'POST':
+        serializer = ReservationRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        quantities = {item['product_id']: item['quantity'] for item in serializer.validated_data['items']}
+        try:
+            reserve_stock(request.user, quantities)
+        except InsufficientStock as exc:
+            return Response({
+                'error': 'Not enough unreserved stock',
+                'product_ids': exc.product_ids,
+            }, status=status.HTTP_409_CONFLICT)
+        holds = _active_reservations(request.user).filter(product_id__in=quantities)
+        return Response(StockReservationSerializer(holds, many=True).data, status=status.HTTP_201_CREATED)
+
+    if request.method == 'DELETE':
+        product_id = request.query_params.get('product_id')
+        if product_id is not None and not product_id.isdigit():
+            return Response({'error': 'product_id must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        released = release_stock(request.user, None if product_id is None else [int(product_id)])
+        return Response({'released': released})
+
+    return Response(StockReservationSerializer(_active_reservations(request.user), many=True).data)
+
+
+AVAILABILITY_MAX_IDS = 100
+
+
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+def product_availability(request):
+    """Get stock, reserved and available quantities of the given product ids"""
+    try:
+        product_ids = {int(value) for value in request.query_params.get('ids', '').split(',') if value.strip()}
+    except ValueError:
+        return Response({'error': 'ids must be a comma separated list of product ids'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(product_ids) > AVAILABILITY_MAX_IDS:
+        return Response({'error': f'At most {AVAILABILITY_MAX_IDS} ids per request'}, status=status.HTTP_400_BAD_REQUEST)
+
+    user = request.user if request.user.is_authenticated else None
+    products = with_availability(Product.objects.filter(pk__in=product_ids).only('id', 'stock_quantity'), user=user)
+    return Response(ProductAvailabilitySerializer(products.order_by('id'), many=True).data)
+
+
+MEMBERSHIP_MAX_IDS = 100
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def product_membership(request):
+    """Get wishlist and cart membership of the given product ids for the current user"""
+    try:
+        product_ids = {int(value) for value in request.query_params.get('ids', '').split(',') if value.strip()}
+    except ValueError:
+        return Response({'error': 'ids must be a comma separated list of product ids'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(product_ids) > MEMBERSHIP_MAX_IDS:
+        return Response({'error': f'At most {MEMBERSHIP_MAX_IDS} ids per request'}, status=status.HTTP_400_BAD_REQUEST)
+
+    membership = {
+        str(product_id): {'in_wishlist': False, 'in_cart': False, 'cart_quantity': 0} for product_id in product_ids
+    }
+    if product_ids:
+        wishlisted = Wishlist.objects.filter(user=request.user, product_id__in=product_ids).annotate(
+            source=Value('wishlist'), amount=Value(0)
+        ).order_by().values_list('product_id', 'source', 'amount')
+        in_cart = CartItem.objects.filter(user=request.user, product_id__in=product_ids).annotate(
+            source=Value('cart'), amount=F('quantity')
+        ).order_by().values_list('product_id', 'source', 'amount')
+
+        for product_id, source, quantity in wishlisted.union(in_cart, all=True):
+            entry = membership[str(product_id)]
+            if source == 'wishlist':
+                entry['in_wishlist'] = True
+            else:
+                entry['in_cart'] = True
+                entry['cart_quantity'] = quantity
+    return Response(membership)
+
+
 class WishlistListCreateView(generics.ListCreateAPIView):
     serializer_class = WishlistSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return Wishlist.objects.filter(user=self.request.user)
+        return Wishlist.objects.filter(user=self.request.user).select_related('user', 'product__vendor')
 
 
 class WishlistDetailView(generics.RetrieveDestroyAPIView):
@@ -197,28 +491,58 @@ class WishlistDetailView(generics.RetrieveDestroyAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return Wishlist.objects.filter(user=self.request.user)
+        return Wishlist.objects.filter(user=self.request.user).select_related('user', 'product__vendor')
 
 
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])
 def featured_products(request):
     """Get featured products"""
-    products = Product.objects.filter(status='active', is_featured=True)[:10]
-    serializer = ProductListSerializer(products, many=True, context={'request': request})
-    return Response(serializer.data)
+    def build():
+        products = Product.objects.filter(status='active', is_featured=True)[:10]
+        return ProductListSerializer(products, many=True, context={'request': request}).data
+
+    # Image URLs are absolute, so entries are kept per host
+    data = cached_response_data('featured_products', request.build_absolute_uri('/'), build)
+    return Response(data)
 
 
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])
-def vendor_products(request, vendor_id):
-    """Get products by specific vendor"""
+def frequently_bought_together(request, pk):
+    """Get the active products most often ordered together with this product"""
+    try:
+        limit = min(int(request.query_params.get('limit', 10)), 50)
+    except ValueError:
+        limit = 10
+
+    pairs = ProductCoPurchase.objects.filter(
+        product_id=pk, related_product__status='active'
+    ).select_related('related_product__vendor').order_by('-count')[:max(limit, 1)]
+
+    serializer = ProductCoPurchaseSerializer(pairs, many=True, context={'request': request})
+    return Response(serializer.data)
+
+
+def _vendor_products_queryset(request, vendor_id):
     products = Product.objects.filter(vendor_id=vendor_id, status='active')
 
     category = request.query_params.get('category', None)
     if category:
         products = products.filter(category=category)
+    return products
+
+
+def _vendor_products_version(request, vendor_id):
+    return product_list_version(_vendor_products_queryset(request, vendor_id))
+
 
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+@versioned_condition(_vendor_products_version)
+def vendor_products(request, vendor_id):
+    """Get products by specific vendor"""
+    products = _vendor_products_queryset(request, vendor_id)
     serializer = ProductListSerializer(products, many=True, context={'request': request})
     return Response(serializer.data)
 
@@ -227,3 +551,33 @@ class CategoryListView(generics.ListAPIView):
     queryset = Category.objects.filter(is_active=True)
     serializer_class = CategorySerializer
     permission_classes = [permissions.AllowAny]
+
+    def list(self, request, *args, **kwargs):
+        data = cached_response_data(
+            'categories',
+            request.build_absolute_uri(),
+            lambda: super(CategoryListView, self).list(request, *args, **kwargs).data
+        )
+        return Response(data)
+
+
+TAG_CLOUD_MAX_LIMIT = 200
+
+
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+def tag_cloud(request):
+    """Get tags used by active products with their product counts"""
+    try:
+        limit = int(request.query_params.get('limit', 50))
+    except ValueError:
+        limit = 50
+
+    tags = Tag.objects.filter(
+        product_tags__product__status='active'
+    ).annotate(
+        product_count=Count('product_tags')
+    ).order_by('-product_count', 'name')[:min(max(limit, 1), TAG_CLOUD_MAX_LIMIT)]
+
+    serializer = TagSerializer(tags, many=True)
+    return Response(serializer.data)